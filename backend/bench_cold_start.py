@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Cold start benchmark for the Mangum/Lambda handler.
+
+Imports main in a fresh interpreter, serves one /health request through the Mangum
+handler and fails if that takes longer than the budget or loads any scraper module.
+Also prints the slowest imports from `python -X importtime`.
+
+    python bench_cold_start.py [--budget SECONDS] [--runs N] [--top N]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+# Seconds allowed from interpreter start to the first /health response
+COLD_START_BUDGET = float(os.environ.get("COLD_START_BUDGET", 1.5))
+# Modules that must only be imported when a scraper is actually used
+LAZY_MODULES = ("torrents", "requests", "bs4", "cloudscraper")
+
+COLD_START = r"""
+import json, sys, time
+start = time.perf_counter()
+from main import handler
+imported = time.perf_counter()
+event = {
+    "version": "2.0",
+    "routeKey": "GET /health",
+    "rawPath": "/health",
+    "rawQueryString": "",
+    "headers": {"host": "localhost", "accept": "application/json"},
+    "requestContext": {
+        "http": {"method": "GET", "path": "/health", "protocol": "HTTP/1.1", "sourceIp": "127.0.0.1"},
+        "stage": "$default",
+    },
+    "isBase64Encoded": False,
+}
+class Context:
+    aws_request_id = "bench"
+response = handler(event, Context())
+served = time.perf_counter()
+print(json.dumps({
+    "status": response["statusCode"],
+    "import": imported - start,
+    "total": served - start,
+    "loaded": sorted(m for m in sys.modules if m.split(".")[0] in %r),
+}))
+""" % (LAZY_MODULES,)
+
+
+def _env():
+    env = dict(os.environ)
+    env.setdefault("AWS_LAMBDA_FUNCTION_NAME", "bench-cold-start")
+    env.setdefault("TOP100_REFRESH_INTERVAL", "0")
+    env.setdefault("WARMUP_ENABLED", "0")
+    return env
+
+
+def cold_start():
+    result = subprocess.run(
+        [sys.executable, "-c", COLD_START],
+        cwd=BACKEND_DIR, env=_env(), capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def import_report(top):
+    """Slowest modules by cumulative import time (microseconds) when importing main."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, env=_env(), capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((int(cumulative_us), int(self_us), name.strip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--budget", type=float, default=COLD_START_BUDGET)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    print("Slowest imports (cumulative / self, ms):")
+    for cumulative, own, name in import_report(args.top):
+        print(f"  {cumulative / 1000:8.1f} {own / 1000:8.1f}  {name}")
+
+    runs = [cold_start() for _ in range(args.runs)]
+    best = min(runs, key=lambda run: run["total"])
+    print(
+        f"\nCold start (best of {args.runs}): import {best['import']:.3f}s, "
+        f"first /health {best['total']:.3f}s, budget {args.budget:.3f}s"
+    )
+
+    failures = []
+    if best["status"] != 200:
+        failures.append(f"/health returned {best['status']}")
+    if best["total"] > args.budget:
+        failures.append(f"cold start {best['total']:.3f}s is over the {args.budget:.3f}s budget")
+    if best["loaded"]:
+        failures.append("scraper modules loaded eagerly: " + ", ".join(best["loaded"]))
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if not failures:
+        print("OK")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
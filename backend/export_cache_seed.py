@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Write the bundled cache seed (cache_seed.json) that empty sqlite caches start from.
+
+Exports the unexpired entries of the local sqlite cache file; with --warm the
+top100 categories are scraped into it first, e.g. as a build step before deploy.
+
+    python export_cache_seed.py [--warm [CATEGORY ...]] [--output PATH]
+"""
+
+import argparse
+import json
+import os
+import sys
+
+os.environ["CACHE_BACKEND"] = "sqlite"
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from helper.cache import CACHE_SEED_PATH, SQLiteCache
+from helper.is_site_available import PirateBay, check_if_site_available
+
+# Namespaces created with make_cache that hold scraper results
+NAMESPACES = ("browse", "search")
+
+
+def warm(categories):
+    available = check_if_site_available("piratebay")["piratebay"]["top_100_categories"]
+    for category in categories or available:
+        if category not in available:
+            print(f"Skipping unknown category {category}")
+            continue
+        data = PirateBay().top100_category(available[category], 1, 100)
+        print(f"{category}: {len(data['data']) if data else 'failed'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--warm", nargs="*", metavar="CATEGORY")
+    parser.add_argument("--output", default=CACHE_SEED_PATH)
+    args = parser.parse_args()
+
+    if args.warm is not None:
+        warm(args.warm)
+
+    seed = {namespace: SQLiteCache(namespace, ttl=0, seed_path=None).items() for namespace in NAMESPACES}
+    with open(args.output, "w") as f:
+        json.dump(seed, f, separators=(",", ":"))
+    print(", ".join(f"{len(entries)} {namespace}" for namespace, entries in seed.items()), "entries written to", args.output)
+
+
+if __name__ == "__main__":
+    main()
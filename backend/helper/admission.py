@@ -0,0 +1,86 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+
+# Upstream scrapes running at once per worker
+ADMISSION_MAX_INFLIGHT = int(os.environ.get("ADMISSION_MAX_INFLIGHT", 16))
+# Scrapes allowed to wait for a slot; more are rejected straight away
+ADMISSION_MAX_QUEUE = int(os.environ.get("ADMISSION_MAX_QUEUE", 64))
+# Seconds a scrape may wait for a slot before it is rejected
+ADMISSION_MAX_WAIT = float(os.environ.get("ADMISSION_MAX_WAIT", 5))
+# Retry-After sent with 503 responses
+ADMISSION_RETRY_AFTER = int(os.environ.get("ADMISSION_RETRY_AFTER", 5))
+
+
+class OverloadedError(Exception):
+    """No scrape slot was available in time; main.py turns it into a 503 with Retry-After."""
+
+    def __init__(self, retry_after=ADMISSION_RETRY_AFTER):
+        super().__init__("Server is busy, retry later.")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Bounded admission for upstream scrapes.
+
+    At most max_inflight scrapes run at once and at most max_queue wait, each for
+    at most max_wait seconds; past that, OverloadedError is raised so callers can
+    serve stale data or shed the request. Cache hits never go through admission.
+    """
+
+    def __init__(
+        self,
+        max_inflight=ADMISSION_MAX_INFLIGHT,
+        max_queue=ADMISSION_MAX_QUEUE,
+        max_wait=ADMISSION_MAX_WAIT,
+    ):
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.inflight = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._semaphore = None
+
+    def saturated(self):
+        """True when new scrapes would have to queue."""
+        return self.inflight >= self.max_inflight
+
+    @asynccontextmanager
+    async def admit(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_inflight)
+        if self._semaphore.locked():
+            if self.waiting >= self.max_queue:
+                self.rejected += 1
+                raise OverloadedError()
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.max_wait)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise OverloadedError()
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+        self.inflight += 1
+        try:
+            yield
+        finally:
+            self.inflight -= 1
+            self._semaphore.release()
+
+    def stats(self):
+        return {
+            "inflight": self.inflight,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+            "max_inflight": self.max_inflight,
+            "max_queue": self.max_queue,
+        }
+
+
+admission = AdmissionController()
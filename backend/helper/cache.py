@@ -0,0 +1,533 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - optional shared backend
+    redis = None
+
+
+def _default_backend():
+    if os.environ.get("AWS_LAMBDA_FUNCTION_NAME"):
+        return "sqlite"
+    if int(os.environ.get("WEB_CONCURRENCY", 1) or 1) > 1:
+        return "tiered"
+    return "memory"
+
+
+# "memory", "sqlite" (one process, persistent), "tiered" (per worker L1 over a shared
+# sqlite L2) or "redis" (L1 over Redis). Serverless containers default to sqlite so warm
+# reuse keeps the cache, several workers to tiered so they share one fetch per key.
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", _default_backend()).lower()
+# SQLite file of the sqlite backend, in the container's writable temp directory
+CACHE_PATH = os.environ.get(
+    "CACHE_PATH", os.path.join(tempfile.gettempdir(), "woztorrentz_cache.db")
+)
+# Bundled snapshot loaded into an empty cache file, see export_cache_seed.py
+CACHE_SEED_PATH = os.environ.get(
+    "CACHE_SEED_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache_seed.json"),
+)
+# Seconds seeded entries stay fresh after being loaded
+CACHE_SEED_TTL = int(os.environ.get("CACHE_SEED_TTL", 600))
+# Per worker L1 in front of a shared backend: entries are kept at most this many seconds
+CACHE_L1_TTL = int(os.environ.get("CACHE_L1_TTL", 30))
+CACHE_L1_MAXSIZE = int(os.environ.get("CACHE_L1_MAXSIZE", 256))
+# Redis server of the redis backend, e.g. redis://localhost:6379/0
+CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL", "")
+# How long one process may hold the fetch lease of a key, and how often others poll for it
+CACHE_LEASE_SECONDS = float(os.environ.get("CACHE_LEASE_SECONDS", 30))
+CACHE_LEASE_POLL = 0.05
+
+
+class _Flight:
+    __slots__ = ("event", "value", "failed")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.failed = False
+
+
+class _SingleFlight:
+    """get_or_set on top of a backend's get/set, collapsing concurrent misses per key."""
+
+    def get_or_set(self, key, factory, ttl=None):
+        """
+        Return the cached value for key, calling factory() on a miss.
+        None results are handed to concurrent waiters but never cached; if factory
+        raises, waiters retry with their own factory.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+
+        if not leader:
+            flight.event.wait()
+            if flight.failed:
+                # The leader raised: try again rather than share its failure
+                return self.get_or_set(key, factory, ttl)
+            return flight.value
+
+        try:
+            flight.value = self._load(key, factory, ttl)
+        except BaseException:
+            flight.failed = True
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+        return flight.value
+
+    def _load(self, key, factory, ttl):
+        value = factory()
+        if value is not None:
+            self.set(key, value, ttl)
+        return value
+
+    def pending(self, key):
+        """True while a get_or_set fetch of key is in flight, so joining it costs no fetch."""
+        return key in self._inflight
+
+
+class _Leased(_SingleFlight):
+    """
+    Cross-process single flight for shared backends: the process holding a key's
+    lease fetches it, the others poll the shared store until the lease is released.
+    Backends provide _acquire, _held and _release.
+    """
+
+    def _load(self, key, factory, ttl):
+        owner = f"{os.getpid()}:{threading.get_ident()}"
+        if self._acquire(key, owner):
+            try:
+                # Another process may have filled it between our miss and the lease
+                value = self.get(key)
+                if value is None:
+                    value = super()._load(key, factory, ttl)
+                return value
+            finally:
+                self._release(key, owner)
+        while self._held(key):
+            time.sleep(CACHE_LEASE_POLL)
+            value = self.get(key)
+            if value is not None:
+                return value
+        # Released without a value: the holder's fetch failed, share that like
+        # in-process waiters do; the next request tries again
+        return self.get(key)
+
+    def pending(self, key):
+        return super().pending(key) or self._held(key)
+
+
+class TTLCache(_SingleFlight):
+    """
+    Thread-safe LRU cache with per-entry expiry.
+
+    Scrapers run in the threadpool, so concurrent misses for the same key are
+    collapsed by get_or_set: one thread computes, the others wait for its value.
+    """
+
+    def __init__(self, ttl, maxsize=1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires REAL NOT NULL,
+    touched REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS cache_touched ON cache (namespace, touched);
+CREATE TABLE IF NOT EXISTS cache_seeded (namespace TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS cache_leases (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    expires REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+"""
+
+
+def _encode_key(key):
+    return json.dumps(key, separators=(",", ":"))
+
+
+class SQLiteCache(_Leased):
+    """
+    TTLCache with the entries kept in a SQLite file, so they outlive the process:
+    warm serverless containers reuse them and cold ones start from the bundled seed.
+    In WAL mode the file is also shared by every worker on the host, with fetch
+    leases stored next to the entries.
+    Keys and values must be JSON serializable; expiry uses wall clock time.
+    """
+
+    # Sets between two size checks
+    EVICT_EVERY = 64
+
+    def __init__(self, namespace, ttl, maxsize=1024, path=CACHE_PATH, seed_path=CACHE_SEED_PATH):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.path = path
+        self.seed_path = seed_path
+        self._conn = None
+        self._pid = None
+        self._sets = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+
+    def _connection(self):
+        # A connection opened before a fork (preloaded app) must not be used by the workers
+        if self._conn is None or self._pid != os.getpid():
+            self._pid = os.getpid()
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._seed(conn)
+            self._conn = conn
+        return self._conn
+
+    def _seed(self, conn):
+        """Load this namespace from the bundled snapshot, once per cache file."""
+        if not self.seed_path or not os.path.exists(self.seed_path):
+            return
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO cache_seeded (namespace) VALUES (?)", (self.namespace,)
+        )
+        if cursor.rowcount == 0:
+            return
+        try:
+            with open(self.seed_path) as f:
+                entries = json.load(f).get(self.namespace, [])
+        except (OSError, ValueError) as e:
+            print(f"Ignoring cache seed {self.seed_path}: {e}")
+            return
+        now = time.time()
+        conn.executemany(
+            "INSERT OR IGNORE INTO cache (namespace, key, value, expires, touched) VALUES (?, ?, ?, ?, ?)",
+            [
+                (self.namespace, _encode_key(key), json.dumps(value), now + CACHE_SEED_TTL, now)
+                for key, value in entries
+            ],
+        )
+
+    def get(self, key, default=None):
+        try:
+            return self._get(key, default)
+        except sqlite3.Error as e:
+            # A broken cache file behaves like an empty cache
+            print(f"Cache {self.namespace} read failed: {e}")
+            return default
+
+    def _get(self, key, default):
+        now = time.time()
+        with self._db_lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT value, expires FROM cache WHERE namespace = ? AND key = ?",
+                (self.namespace, _encode_key(key)),
+            ).fetchone()
+            if row is None:
+                return default
+            if row[1] < now:
+                conn.execute(
+                    "DELETE FROM cache WHERE namespace = ? AND key = ?",
+                    (self.namespace, _encode_key(key)),
+                )
+                return default
+            conn.execute(
+                "UPDATE cache SET touched = ? WHERE namespace = ? AND key = ?",
+                (now, self.namespace, _encode_key(key)),
+            )
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        try:
+            self._set(key, value, ttl)
+        except sqlite3.Error as e:
+            print(f"Cache {self.namespace} write failed: {e}")
+
+    def _set(self, key, value, ttl):
+        now = time.time()
+        expires = now + (self.ttl if ttl is None else ttl)
+        with self._db_lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, expires, touched) VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, _encode_key(key), json.dumps(value), expires, now),
+            )
+            self._sets += 1
+            if self._sets % self.EVICT_EVERY == 0:
+                self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM cache WHERE namespace = ? AND expires < ?", (self.namespace, now))
+        conn.execute(
+            """
+            DELETE FROM cache WHERE namespace = ? AND key IN (
+                SELECT key FROM cache WHERE namespace = ?
+                ORDER BY touched DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.namespace, self.namespace, self.maxsize),
+        )
+
+    def delete(self, key):
+        with self._db_lock:
+            self._connection().execute(
+                "DELETE FROM cache WHERE namespace = ? AND key = ?",
+                (self.namespace, _encode_key(key)),
+            )
+
+    def _acquire(self, key, owner):
+        now = time.time()
+        try:
+            with self._db_lock:
+                conn = self._connection()
+                conn.execute(
+                    "DELETE FROM cache_leases WHERE namespace = ? AND key = ? AND expires < ?",
+                    (self.namespace, _encode_key(key), now),
+                )
+                return conn.execute(
+                    "INSERT OR IGNORE INTO cache_leases (namespace, key, owner, expires) VALUES (?, ?, ?, ?)",
+                    (self.namespace, _encode_key(key), owner, now + CACHE_LEASE_SECONDS),
+                ).rowcount == 1
+        except sqlite3.Error as e:
+            print(f"Cache {self.namespace} lease failed: {e}")
+            return True
+
+    def _held(self, key):
+        try:
+            with self._db_lock:
+                return self._connection().execute(
+                    "SELECT 1 FROM cache_leases WHERE namespace = ? AND key = ? AND expires >= ?",
+                    (self.namespace, _encode_key(key), time.time()),
+                ).fetchone() is not None
+        except sqlite3.Error:
+            return False
+
+    def _release(self, key, owner):
+        try:
+            with self._db_lock:
+                self._connection().execute(
+                    "DELETE FROM cache_leases WHERE namespace = ? AND key = ? AND owner = ?",
+                    (self.namespace, _encode_key(key), owner),
+                )
+        except sqlite3.Error as e:
+            print(f"Cache {self.namespace} lease release failed: {e}")
+
+    def items(self):
+        """Unexpired (key, value) pairs, used to export a seed snapshot."""
+        with self._db_lock:
+            rows = self._connection().execute(
+                "SELECT key, value FROM cache WHERE namespace = ? AND expires >= ?",
+                (self.namespace, time.time()),
+            ).fetchall()
+        return [(json.loads(key), json.loads(value)) for key, value in rows]
+
+    def __len__(self):
+        with self._db_lock:
+            return self._connection().execute(
+                "SELECT COUNT(*) FROM cache WHERE namespace = ?", (self.namespace,)
+            ).fetchone()[0]
+
+
+class RedisCache(_Leased):
+    """
+    Shared cache on a Redis compatible server. Entries expire through PX, fetch
+    leases are SET NX PX keys. Connection errors behave like misses.
+    """
+
+    # Deletes the lease only if this process still owns it
+    _RELEASE = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+    def __init__(self, namespace, ttl, url=CACHE_REDIS_URL):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.client = redis.Redis.from_url(url)
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def _key(self, key, kind="cache"):
+        return f"woztorrentz:{kind}:{self.namespace}:{_encode_key(key)}"
+
+    def get(self, key, default=None):
+        try:
+            raw = self.client.get(self._key(key))
+        except redis.RedisError as e:
+            print(f"Cache {self.namespace} read failed: {e}")
+            return default
+        return default if raw is None else json.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        try:
+            self.client.set(self._key(key), json.dumps(value), px=max(1, int(ttl * 1000)))
+        except redis.RedisError as e:
+            print(f"Cache {self.namespace} write failed: {e}")
+
+    def delete(self, key):
+        try:
+            self.client.delete(self._key(key))
+        except redis.RedisError as e:
+            print(f"Cache {self.namespace} delete failed: {e}")
+
+    def _acquire(self, key, owner):
+        try:
+            return bool(self.client.set(
+                self._key(key, "lease"), owner, nx=True, px=int(CACHE_LEASE_SECONDS * 1000)
+            ))
+        except redis.RedisError as e:
+            print(f"Cache {self.namespace} lease failed: {e}")
+            return True
+
+    def _held(self, key):
+        try:
+            return bool(self.client.exists(self._key(key, "lease")))
+        except redis.RedisError:
+            return False
+
+    def _release(self, key, owner):
+        try:
+            self.client.eval(self._RELEASE, 1, self._key(key, "lease"), owner)
+        except redis.RedisError as e:
+            print(f"Cache {self.namespace} lease release failed: {e}")
+
+    def __len__(self):
+        try:
+            return sum(1 for _ in self.client.scan_iter(match=f"woztorrentz:cache:{self.namespace}:*"))
+        except redis.RedisError:
+            return 0
+
+
+class TieredCache(_SingleFlight):
+    """
+    Small per worker L1 (TTLCache) in front of a shared L2 (SQLiteCache or RedisCache).
+    L1 hits cost no I/O; L1 misses read L2, and L2 misses are fetched by one process
+    for the whole host through the L2's leases.
+    """
+
+    def __init__(self, shared, l1_ttl=CACHE_L1_TTL, l1_maxsize=CACHE_L1_MAXSIZE):
+        self.shared = shared
+        self.ttl = shared.ttl
+        self.l1_ttl = l1_ttl
+        self.local = TTLCache(l1_ttl, l1_maxsize)
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def _l1_ttl(self, ttl):
+        return min(self.l1_ttl, self.ttl if ttl is None else ttl)
+
+    def get(self, key, default=None):
+        value = self.local.get(key)
+        if value is None:
+            value = self.shared.get(key)
+            if value is None:
+                return default
+            self.local.set(key, value, self._l1_ttl(None))
+        return value
+
+    def set(self, key, value, ttl=None):
+        self.shared.set(key, value, ttl)
+        self.local.set(key, value, self._l1_ttl(ttl))
+
+    def delete(self, key):
+        self.local.delete(key)
+        self.shared.delete(key)
+
+    def pending(self, key):
+        return super().pending(key) or self.shared.pending(key)
+
+    def _load(self, key, factory, ttl):
+        value = self.shared.get_or_set(key, factory, ttl)
+        if value is not None:
+            self.local.set(key, value, self._l1_ttl(ttl))
+        return value
+
+    def __len__(self):
+        return len(self.shared)
+
+
+# Caches created through make_cache, by namespace
+caches = {}
+
+
+def make_cache(namespace, ttl, maxsize=1024, l1=True):
+    """
+    Cache for JSON serializable scraper results on the CACHE_BACKEND backend.
+    Every backend shares the TTLCache interface, so callers don't care which one they get.
+    With l1=False shared backends are used without the per worker L1, for state every
+    worker must see as soon as it is written.
+    """
+    backend = CACHE_BACKEND
+    if backend == "redis" and (redis is None or not CACHE_REDIS_URL):
+        print("CACHE_BACKEND=redis needs the redis package and CACHE_REDIS_URL, using tiered")
+        backend = "tiered"
+    if backend in ("sqlite", "tiered") and not CACHE_PATH:
+        backend = "memory"
+
+    if backend == "redis":
+        cache = RedisCache(namespace, ttl)
+        if l1:
+            cache = TieredCache(cache)
+    elif backend == "tiered":
+        cache = SQLiteCache(namespace, ttl, maxsize)
+        if l1:
+            cache = TieredCache(cache)
+    elif backend == "sqlite":
+        cache = SQLiteCache(namespace, ttl, maxsize)
+    else:
+        cache = TTLCache(ttl, maxsize)
+    caches[namespace] = cache
+    return cache
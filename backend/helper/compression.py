@@ -0,0 +1,175 @@
+import gzip
+import zlib
+
+from fastapi.responses import Response
+
+from helper.http_cache import content_etag, encoded_etag, if_none_match, not_modified
+from helper.serialization import APIResponse, wire_format
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional, gzip is always available
+    brotli = None
+
+
+# Bodies smaller than this are sent uncompressed
+MIN_SIZE = 500
+# Rendered bodies kept per cache holder (one per limit/wire format/fields combination)
+MAX_CACHED_BODIES = 32
+COMPRESSIBLE_TYPES = ("application/json", "application/msgpack", "text/plain", "text/html", "text/markdown")
+
+
+def negotiate_encoding(accept_encoding):
+    """Best supported content-coding in an Accept-Encoding header: br, then gzip, else None."""
+    if not accept_encoding:
+        return None
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(coding.strip())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+def cached_response(request, bodies, key, build, version=None, cache_control=None):
+    """
+    Respond with a body rendered and compressed at most once per holder.
+
+    `bodies` is a dict owned by the cached object (e.g. a top100 snapshot) and dies
+    with it; `build()` returns the content to render on the first request for key.
+    With a `version` the ETag is known before rendering, so a matching If-None-Match
+    is answered 304 without touching the body; otherwise the ETag is a content hash.
+    """
+    body_key = (key,) + wire_format()
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    vary = "Accept, Accept-Encoding"
+    etag = None
+
+    entry = bodies.get(body_key)
+    if entry is None and version is not None:
+        # Snapshot bodies are always large enough to be compressed
+        etag = f'"v{version}-{zlib.crc32(repr(body_key).encode()):08x}"'
+        if cache_control and if_none_match(request, etag):
+            return not_modified(encoded_etag(etag, encoding), cache_control, vary)
+    if entry is None:
+        if len(bodies) >= MAX_CACHED_BODIES:
+            bodies.clear()
+        rendered = APIResponse(build())
+        entry = bodies[body_key] = {
+            None: rendered.body,
+            "media_type": rendered.media_type,
+            "etag": etag if version is not None else content_etag(rendered.body),
+        }
+
+    if encoding is not None and len(entry[None]) < MIN_SIZE:
+        encoding = None
+    etag = encoded_etag(entry["etag"], encoding)
+    if cache_control and if_none_match(request, entry["etag"]):
+        return not_modified(etag, cache_control, vary)
+    if encoding is not None and encoding not in entry:
+        entry[encoding] = compress(entry[None], encoding)
+    headers = {"Vary": vary}
+    if cache_control:
+        headers["ETag"] = etag
+        headers["Cache-Control"] = cache_control
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(entry[encoding], media_type=entry["media_type"], headers=headers)
+
+
+def with_validators(request, response, cache_control, etag=None):
+    """
+    Add an ETag (a hash of the body unless given) and Cache-Control to an already
+    rendered response, answering 304 instead when the client holds the same body.
+    """
+    if response.status_code != 200:
+        return response
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    if encoding is not None and len(response.body) < MIN_SIZE:
+        encoding = None
+    etag = etag or content_etag(response.body)
+    if if_none_match(request, etag):
+        # Same Vary as the 200 it revalidates (APIResponse plus CompressionMiddleware)
+        return not_modified(encoded_etag(etag, encoding), cache_control, "Accept, Accept-Encoding")
+    # CompressionMiddleware adds the content-coding suffix when it compresses
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    return response
+
+
+class CompressionMiddleware:
+    """
+    gzip/brotli compression negotiated from Accept-Encoding.
+    Streaming responses and responses that are already encoded are passed through.
+    """
+
+    def __init__(self, app, minimum_size=MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        accept_encoding = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        encoding = negotiate_encoding(accept_encoding)
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start = None
+        passthrough = False
+
+        async def wrapped_send(message):
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                headers = {k.lower(): v for k, v in message.get("headers", [])}
+                content_type = headers.get(b"content-type", b"").decode("latin-1")
+                passthrough = (
+                    b"content-encoding" in headers
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                )
+                if passthrough:
+                    await send(message)
+                else:
+                    start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            if message.get("more_body", False):
+                # Streaming body: send it as is
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+            headers = [(k, v) for k, v in start.get("headers", []) if k.lower() != b"content-length"]
+            if len(body) >= self.minimum_size:
+                body = compress(body, encoding)
+                headers = [
+                    (k, encoded_etag(v.decode("latin-1"), encoding).encode("latin-1"))
+                    if k.lower() == b"etag" else (k, v)
+                    for k, v in headers
+                ]
+                headers.append((b"content-encoding", encoding.encode()))
+                headers.append((b"vary", b"Accept-Encoding"))
+            headers.append((b"content-length", str(len(body)).encode()))
+            await send({**start, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, wrapped_send)
@@ -0,0 +1,258 @@
+import asyncio
+import base64
+import binascii
+import json
+import os
+import traceback
+from collections import deque
+
+from helper.admission import OverloadedError
+from helper.cache import TTLCache, make_cache
+from helper.is_site_available import check_if_site_available
+from helper.merge import AGGREGATES, normalize_infohash
+from helper.release_parser import filter_by_release
+from helper.scrape import search_site
+
+
+# How long a merged result set stays resumable after its last use
+CURSOR_TTL = int(os.environ.get("CURSOR_TTL", 900))
+# Upstream pages fetched per site before a result set is considered complete
+CURSOR_MAX_PAGES = int(os.environ.get("CURSOR_MAX_PAGES", 10))
+MAX_PAGE_SIZE = 100
+
+# Live result sets of this worker, and their state in the shared tier so a cursor
+# resumed by another worker continues the same set instead of rebuilding it
+_result_sets = TTLCache(ttl=CURSOR_TTL, maxsize=256)
+_shared_sets = make_cache("cursors", ttl=CURSOR_TTL, maxsize=256, l1=False)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(state):
+    """Opaque, URL safe cursor for a result set position."""
+    raw = json.dumps(state, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        state = json.loads(raw)
+        sites = []
+        for site, limit in state["s"]:
+            all_sites = check_if_site_available(site)
+            if not all_sites:
+                raise InvalidCursor(f"{site} not supported")
+            sites.append((site, max(1, min(int(limit), all_sites[site]["limit"]))))
+        return {
+            "q": str(state["q"]),
+            "s": sites,
+            "a": state["a"] if state["a"] in AGGREGATES else "max",
+            "r": None if state.get("r") is None else str(state["r"]),
+            "n": max(1, min(int(state["n"]), MAX_PAGE_SIZE)),
+            "o": max(0, int(state["o"])),
+        }
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise InvalidCursor("Invalid or corrupted cursor")
+
+
+class ResultSet:
+    """
+    Lazily merged search results of one or more sites.
+
+    Every site's rows arrive best-seeded first, so rows are merged k-way from
+    per-site buffers; a site's next upstream page is fetched only once its buffer
+    runs dry while rows are still wanted. Rows already handed out never move, so a
+    cursor offset keeps pointing at the same place while the set grows.
+    """
+
+    def __init__(self, query, sites, aggregate="max", resolution=None):
+        self.query = query
+        self.sites = sites
+        self.aggregate = aggregate
+        self.resolution = resolution
+        self.rows = []
+        self.fetches = 0
+        self._combine = AGGREGATES[aggregate]
+        self._buffers = {site: deque() for site, _ in sites}
+        self._pages = {site: 0 for site, _ in sites}
+        self._seen = {site: set() for site, _ in sites}
+        self._exhausted = set()
+        self._records = {}
+        self._lock = asyncio.Lock()
+
+    def state(self):
+        """JSON serializable state, see from_state."""
+        placed = {id(row) for row in self.rows}
+        return {
+            "rows": self.rows,
+            # Records dropped by the release filter still aggregate later copies
+            "filtered": [record for record in self._records.values() if id(record) not in placed],
+            "buffers": {site: list(buffer) for site, buffer in self._buffers.items()},
+            "pages": self._pages,
+            "seen": {site: list(keys) for site, keys in self._seen.items()},
+            "exhausted": list(self._exhausted),
+            "fetches": self.fetches,
+        }
+
+    @classmethod
+    def from_state(cls, query, sites, aggregate, resolution, state):
+        """A result set continuing where the one that saved `state` stopped."""
+        result_set = cls(query, sites, aggregate, resolution)
+        result_set.rows = [{**row, "sources": list(row["sources"])} for row in state["rows"]]
+        filtered = [{**record, "sources": list(record["sources"])} for record in state["filtered"]]
+        for record in result_set.rows + filtered:
+            infohash = normalize_infohash(record.get("hash"))
+            if infohash:
+                result_set._records[infohash] = record
+        for site, _ in sites:
+            result_set._buffers[site].extend(state["buffers"].get(site, ()))
+            result_set._pages[site] = state["pages"].get(site, 0)
+            result_set._seen[site].update(state["seen"].get(site, ()))
+        result_set._exhausted.update(state["exhausted"])
+        result_set.fetches = state["fetches"]
+        return result_set
+
+    @property
+    def complete(self):
+        return len(self._exhausted) == len(self.sites) and not any(self._buffers.values())
+
+    def _starving(self):
+        return [
+            (site, limit) for site, limit in self.sites
+            if not self._buffers[site] and site not in self._exhausted
+        ]
+
+    async def _fetch(self, site, limit):
+        page = self._pages[site] + 1
+        if page > CURSOR_MAX_PAGES:
+            self._exhausted.add(site)
+            return
+        self._pages[site] = page
+        self.fetches += 1
+        try:
+            data = await search_site(site, self.query, page, limit)
+        except OverloadedError:
+            # Shed, not exhausted: the page is fetched again by the next request
+            self._pages[site] = page - 1
+            self.fetches -= 1
+            raise
+        except Exception:
+            traceback.print_exc()
+            data = None
+        rows = (data or {}).get("data") or []
+        # Past the last page some sites repeat it instead of returning nothing
+        keys = [row.get("hash") or row.get("url") for row in rows]
+        if not rows or all(key in self._seen[site] for key in keys):
+            self._exhausted.add(site)
+            return
+        self._seen[site].update(keys)
+        self._buffers[site].extend({**row, "site": site} for row in rows)
+
+    def _add(self, row):
+        infohash = normalize_infohash(row.get("hash"))
+        source = {"site": row.get("site"), "url": row.get("url")}
+        record = self._records.get(infohash) if infohash else None
+        if record is not None:
+            # Already placed: later sources only update the aggregated counts
+            record["seeders"] = self._combine(record.get("seeders") or 0, row.get("seeders") or 0)
+            record["leechers"] = self._combine(record.get("leechers") or 0, row.get("leechers") or 0)
+            if source not in record["sources"]:
+                record["sources"].append(source)
+            return
+        record = {**row, "sources": [source]}
+        if infohash:
+            record["hash"] = infohash
+            self._records[infohash] = record
+        if filter_by_release([record], resolution=self.resolution):
+            self.rows.append(record)
+
+    def _merge(self, count):
+        while len(self.rows) < count and not self._starving():
+            heads = [site for site, _ in self.sites if self._buffers[site]]
+            if not heads:
+                return
+            best = max(heads, key=lambda site: self._buffers[site][0].get("seeders") or 0)
+            self._add(self._buffers[best].popleft())
+
+    async def ensure(self, count):
+        """Merge until at least `count` rows are available or every site is exhausted."""
+        async with self._lock:
+            while len(self.rows) < count and not self.complete:
+                starving = self._starving()
+                if starving:
+                    # Every fetch settles before a shed one is re-raised, so none keeps
+                    # running once the lock is released
+                    results = await asyncio.gather(
+                        *(self._fetch(site, limit) for site, limit in starving), return_exceptions=True
+                    )
+                    for result in results:
+                        if isinstance(result, BaseException):
+                            raise result
+                self._merge(count)
+
+
+def _result_set(key, query, sites, aggregate, resolution):
+    result_set = _result_sets.get(key)
+    if result_set is None:
+        state = _shared_sets.get(key)
+        if state is None:
+            result_set = ResultSet(query, sites, aggregate, resolution)
+        else:
+            result_set = ResultSet.from_state(query, sites, aggregate, resolution, state)
+        _result_sets.set(key, result_set)
+    return result_set
+
+
+async def paginate(query, sites, page_size, offset=0, aggregate="max", resolution=None):
+    """
+    One page of a cached merged result set.
+
+    Args:
+        query (str): Search query
+        sites (list): (site, upstream page limit) pairs to merge
+        page_size (int): Rows per client page
+        offset (int): Position in the merged result set
+        aggregate (str): How seeders/leechers of the same torrent are combined
+        resolution (str): Optional parsed release resolution filter
+
+    Returns:
+        dict: data, next_cursor (None at the end), offset, page_size and upstream fetches made
+    """
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    key = (" ".join(query.lower().split()), [list(site) for site in sites], aggregate, resolution)
+    result_set = _result_set(json.dumps(key), query, sites, aggregate, resolution)
+    fetches = result_set.fetches
+    # One row of look-ahead tells whether a next page exists
+    await result_set.ensure(offset + page_size + 1)
+    if result_set.fetches != fetches:
+        _shared_sets.set(json.dumps(key), result_set.state())
+    rows = result_set.rows[offset:offset + page_size]
+    next_offset = offset + len(rows)
+    next_cursor = None
+    if next_offset < len(result_set.rows):
+        next_cursor = encode_cursor({
+            "q": query,
+            "s": sites,
+            "a": aggregate,
+            "r": resolution,
+            "n": page_size,
+            "o": next_offset,
+        })
+    return {
+        "data": rows,
+        "next_cursor": next_cursor,
+        "offset": offset,
+        "page_size": page_size,
+        "fetches": result_set.fetches - fetches,
+    }
+
+
+async def resume(cursor):
+    """The page a cursor from paginate() points at; raises InvalidCursor for bad input."""
+    state = decode_cursor(cursor)
+    return await paginate(
+        state["q"], state["s"], state["n"], state["o"], state["a"], state["r"]
+    )
@@ -0,0 +1,104 @@
+import asyncio
+import os
+import time
+
+from helper.is_site_available import check_if_site_available
+from helper.merge import normalize_infohash
+from helper.scrape import search_site
+
+
+# Most upstream pages per site one deep search may ask for
+DEEP_SEARCH_MAX_DEPTH = int(os.environ.get("DEEP_SEARCH_MAX_DEPTH", 10))
+# Pages of one site fetched at once; the per-host limiter still paces the requests
+DEEP_SEARCH_PARALLEL = int(os.environ.get("DEEP_SEARCH_PARALLEL", 4))
+
+
+def _short(site, data):
+    """True when a results page is the site's last one."""
+    rows = (data or {}).get("data") or []
+    page_size = check_if_site_available(site)[site]["website"].PAGE_SIZE
+    return data is None or data.get("page_rows", len(rows)) < page_size
+
+
+def rank(rows):
+    """Dedupe rows by infohash (or url) keeping the best seeded copy, best seeded first."""
+    seen = set()
+    ranked = []
+    for row in sorted(rows, key=lambda row: row.get("seeders") or 0, reverse=True):
+        key = normalize_infohash(row.get("hash")) or row.get("url") or row.get("name")
+        if key in seen:
+            continue
+        seen.add(key)
+        ranked.append(row)
+    return ranked
+
+
+async def search_pages(site, query, depth, limit, start=1, fetch=None, on_page=None):
+    """
+    Fetch pages start..start+depth-1 of one site's search, DEEP_SEARCH_PARALLEL at a time.
+
+    Pages go through search_site (or `fetch(page)`), so they are cached and shared
+    with single-page searches. No page after a short one is requested, and pages
+    past it that were already in flight are dropped.
+
+    Args:
+        site (str): Site key
+        query (str): Search query
+        depth (int): Number of upstream pages
+        limit (int): Rows requested per upstream page
+        start (int): First upstream page
+        fetch (callable): Coroutine function page -> results, defaults to search_site
+        on_page (callable): Called with (page, results) as each kept page arrives
+
+    Returns:
+        dict: deduped and ranked data, total, pages fetched and time, or None when
+        the first page failed
+    """
+    start_time = time.time()
+    if fetch is None:
+        async def fetch(page):
+            return await search_site(site, query, page, limit)
+
+    last = start + depth - 1
+    next_page = start
+    pages = {}
+    tasks = {}
+    try:
+        while tasks or next_page <= last:
+            while next_page <= last and len(tasks) < DEEP_SEARCH_PARALLEL:
+                tasks[asyncio.ensure_future(fetch(next_page))] = next_page
+                next_page += 1
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in sorted(done, key=tasks.get):
+                page = tasks.pop(task)
+                if page > last:
+                    continue
+                try:
+                    data = task.result()
+                except Exception:
+                    if page == start:
+                        raise
+                    # A failed later page ends the search like a short one
+                    data = None
+                if data is not None:
+                    pages[page] = data
+                    if on_page is not None:
+                        on_page(page, data)
+                if _short(site, data):
+                    last = page if data is not None else page - 1
+            for task in [task for task, page in tasks.items() if page > last]:
+                task.cancel()
+                del tasks[task]
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    if start not in pages:
+        return None
+    rows = rank([row for page in sorted(pages) if page <= last for row in pages[page].get("data") or []])
+    return {
+        "data": rows,
+        "total": len(rows),
+        "pages": len([page for page in pages if page <= last]),
+        "time": time.time() - start_time,
+    }
@@ -1,20 +1,98 @@
-import os
+import math
 
-from fastapi import Security, HTTPException, status
+from fastapi import Request, Security, HTTPException, status
 from fastapi.security import APIKeyHeader
 
+from helper.quotas import anonymous_metered, anonymous_quota, current_key, quotas
+
 
-api_key = os.environ.get("PYTORRENT_API_KEY")
 api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
 
-def authenticate_request(
+
+def _forbidden():
+    return HTTPException(
+        status_code=status.HTTP_403_FORBIDDEN,
+        detail="Access forbidden: Incorrect credentials."
+    )
+
+
+def _charge(quota, cost=1, request=True):
+    """Spend `cost` of the quota's tokens and make it the current request's key."""
+    wait = quota.take(cost, request)
+    if wait:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Rate limit exceeded for this API key.",
+            headers={"Retry-After": str(math.ceil(wait)) if wait != math.inf else "3600"},
+        )
+    # Async dependencies run in the request's own context, so the endpoint sees the key
+    current_key.set(quota)
+
+
+def _caller_quota(request, x_api_key):
+    """The quota of a key, or of a keyless client IP; None when the caller is not metered."""
+    if x_api_key:
+        quota = quotas.get(x_api_key)
+    elif not anonymous_metered:
+        return None
+    else:
+        quota = anonymous_quota(request.client.host if request.client else "unknown")
+    if quota is None:
+        raise _forbidden()
+    return quota
+
+
+async def authenticate_request(
     x_api_key: str = Security(api_key_header),
 ):
     """
-    Dependency function to authenticate a request with an API key.
+    Dependency function to authenticate a request with an API key and charge its quota.
+    Open to everyone when no keys are configured.
     """
-    if api_key and x_api_key != api_key:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access forbidden: Incorrect credentials."
-        )
+    if not quotas:
+        return
+    quota = quotas.get(x_api_key)
+    if quota is None:
+        raise _forbidden()
+    _charge(quota)
+
+
+async def authenticate_or_anonymous(
+    request: Request,
+    x_api_key: str = Security(api_key_header),
+):
+    """
+    Like authenticate_request, but keyless requests are served on a per client IP quota
+    (API_ANON_RATE) instead of being refused, for routes the browser frontend calls.
+    Unmetered while only the legacy PYTORRENT_API_KEY is configured.
+    """
+    if not quotas:
+        return
+    quota = _caller_quota(request, x_api_key)
+    if quota is not None:
+        _charge(quota)
+
+
+async def identify_request(
+    request: Request,
+    x_api_key: str = Security(api_key_header),
+):
+    """Resolve the caller's quota like authenticate_or_anonymous without spending a token."""
+    if not quotas:
+        return
+    quota = _caller_quota(request, x_api_key)
+    if quota is not None:
+        current_key.set(quota)
+
+
+def charge_cost(cost):
+    """
+    Charge the rest of an expensive request: the route's dependency spent one token,
+    batch, deep and job searches cost one per upstream page they may scrape.
+    Capped at the key's burst so a large request drains the bucket instead of never passing.
+    """
+    quota = current_key.get()
+    if quota is None or cost <= 1:
+        return
+    extra = (cost if quota.burst is None else min(cost, quota.burst)) - 1
+    _charge(quota, extra, request=False)
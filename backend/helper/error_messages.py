@@ -1,4 +1,4 @@
-from fastapi.responses import JSONResponse
+from helper.serialization import APIResponse
 
 def error_handler(status_code: int, message: dict):
-    return JSONResponse(status_code=status_code, content=message)
+    return APIResponse(status_code=status_code, content=message)
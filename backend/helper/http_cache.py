@@ -0,0 +1,80 @@
+import hashlib
+
+from fastapi.responses import Response
+
+
+# Cache-Control per kind of route
+TOP100_CACHE_CONTROL = "public, max-age=60, stale-while-revalidate=600"
+LIVE_CACHE_CONTROL = "public, max-age=30, stale-while-revalidate=120"
+STATIC_CACHE_CONTROL = "public, max-age=3600, stale-while-revalidate=86400"
+
+
+def content_etag(body):
+    """Strong ETag from a rendered body."""
+    return '"' + hashlib.sha1(body).hexdigest()[:24] + '"'
+
+
+def encoded_etag(etag, encoding):
+    """Distinct strong ETag for a content-coded representation, e.g. "abc" -> "abc-gzip"."""
+    if not encoding or not etag.endswith('"'):
+        return etag
+    return etag[:-1] + "-" + encoding + '"'
+
+
+def if_none_match(request, etag):
+    """
+    True when the request's If-None-Match lists etag (weak comparison, as RFC 9110 asks).
+    Content-coding suffixes added by encoded_etag are ignored, so a client holding the
+    gzip variant revalidates against the identity ETag.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    bare = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        for suffix in ('-gzip"', '-br"'):
+            if candidate.endswith(suffix):
+                candidate = candidate[:-len(suffix)] + '"'
+        if candidate == bare:
+            return True
+    return False
+
+
+def not_modified(etag, cache_control, vary="Accept, Accept-Encoding"):
+    return Response(
+        status_code=304,
+        headers={"ETag": etag, "Cache-Control": cache_control, "Vary": vary},
+    )
+
+
+class PrivateCacheMiddleware:
+    """
+    Marks responses under the given path prefixes as private to the client and varying
+    on X-API-Key, so shared caches (CDN edges, proxies) can't serve a response bought
+    with one key's quota to other callers.
+    """
+
+    def __init__(self, app, prefixes):
+        self.app = app
+        self.prefixes = tuple(prefixes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefixes):
+            return await self.app(scope, receive, send)
+
+        async def wrapped_send(message):
+            if message["type"] == "http.response.start":
+                headers = [
+                    (k, v.replace(b"public", b"private")) if k.lower() == b"cache-control" else (k, v)
+                    for k, v in message.get("headers", [])
+                ]
+                headers.append((b"vary", b"X-API-Key"))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, wrapped_send)
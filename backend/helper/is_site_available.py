@@ -1,13 +1,46 @@
+import importlib
 
-from torrents.limetorrents import Limetorrents
-from torrents.pirate_bay import PirateBay
-from torrents.kickass import Kickass
+
+class LazyScraper:
+    """
+    Scraper class reference that imports its module on first use, so importing the
+    site registry (and every router) does not pull in requests, cloudscraper or bs4.
+    Calling it instantiates the scraper; other attributes are read from the class.
+    """
+
+    __slots__ = ("module", "attribute", "_name", "_class")
+
+    def __init__(self, module, attribute, name):
+        self.module = module
+        self.attribute = attribute
+        # Display name, available without importing the scraper
+        self._name = name
+        self._class = None
+
+    def load(self):
+        if self._class is None:
+            self._class = getattr(importlib.import_module(self.module), self.attribute)
+        return self._class
+
+    def __call__(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.load(), name)
+
+    def __repr__(self):
+        return f"<LazyScraper {self.module}.{self.attribute}>"
+
+
+PirateBay = LazyScraper("torrents.pirate_bay", "PirateBay", "Pirate Bay")
+Kickass = LazyScraper("torrents.kickass", "Kickass", "Kickass")
+Limetorrents = LazyScraper("torrents.limetorrents", "Limetorrents", "Limetorrents")
 
 all_sites = {
     "piratebay": {
         "website": PirateBay,
         "trending_available": True,
-        "trending_category": False,
+        "trending_category": True,
         "recent_available": True,
         "recent_category_available": True,
         "top_100_available": True,
@@ -77,7 +110,7 @@ all_sites = {
 sites_config = {
     key: {
         **site_info,
-        "website": site_info["website"] # Store the class, not an instance
+        "website": site_info["website"] # Store the class reference, not an instance
     } for key, site_info in all_sites.items()
 }
 
@@ -0,0 +1,253 @@
+import asyncio
+import os
+import secrets
+import time
+import traceback
+
+from helper.admission import OverloadedError
+from helper.cache import make_cache
+from helper.deep_search import search_pages
+from helper.merge import merge_by_infohash
+from helper.release_parser import filter_by_release
+from helper.scrape import search_site
+
+
+# Deep search jobs running at once; later ones wait their turn
+JOB_CONCURRENCY = int(os.environ.get("JOB_CONCURRENCY", 2))
+# Jobs allowed to wait; submitting more is answered with a 503
+JOB_MAX_QUEUED = int(os.environ.get("JOB_MAX_QUEUED", 32))
+# Seconds a job and its results stay readable after it was last updated
+JOB_TTL = int(os.environ.get("JOB_TTL", 1800))
+# Most upstream pages per site one job may ask for
+JOB_MAX_PAGES = int(os.environ.get("JOB_MAX_PAGES", 10))
+# Times a shed page fetch is retried after backing off for its Retry-After
+JOB_OVERLOAD_RETRIES = 3
+# Seconds between two writes of a running job's merged results to the shared tier;
+# progress is written on every page, the results again when the job ends
+JOB_RESULTS_INTERVAL = float(os.environ.get("JOB_RESULTS_INTERVAL", 5))
+# Background work does not outlive a serverless invocation
+JOBS_ENABLED = not os.environ.get("AWS_LAMBDA_FUNCTION_NAME")
+
+
+def job_view(state, offset=0, limit=None):
+    """A stored job state with its results paged by offset/limit."""
+    end = None if limit is None else offset + limit
+    return {**state, "offset": offset, "data": state["data"][offset:end]}
+
+
+class Job:
+    """A deep search across several sites and upstream pages, filled in as pages arrive."""
+
+    def __init__(self, query, sites, pages, aggregate="max", resolution=None):
+        self.id = secrets.token_urlsafe(12)
+        self.query = query
+        self.sites = sites
+        self.pages = pages
+        self.aggregate = aggregate
+        self.resolution = resolution
+        self.status = "queued"
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.fetched = 0
+        self.errors = {}
+        self.task = None
+        self.saved = 0.0
+        self._rows = []
+        self._merged = None
+
+    @property
+    def done(self):
+        return self.status in ("done", "failed", "cancelled")
+
+    def add(self, site, rows):
+        self._rows.extend({**row, "site": site} for row in rows)
+        self._merged = None
+
+    def results(self):
+        """Rows merged by infohash and ranked by seeders; recomputed only after new pages arrive."""
+        if self._merged is None:
+            rows = sorted(self._rows, key=lambda row: row.get("seeders") or 0, reverse=True)
+            merged = merge_by_infohash(rows, self.aggregate)
+            if self.aggregate != "max":
+                merged.sort(key=lambda row: row.get("seeders") or 0, reverse=True)
+            self._merged = filter_by_release(merged, resolution=self.resolution)
+        return self._merged
+
+    def state(self):
+        """Status and progress as stored in the shared tier, without the results."""
+        return {
+            "id": self.id,
+            "status": self.status,
+            "query": self.query,
+            "sites": [site for site, _ in self.sites],
+            "pages": self.pages,
+            "progress": {"fetched": self.fetched, "total": len(self.sites) * self.pages},
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "errors": self.errors,
+        }
+
+    def results_state(self):
+        results = self.results()
+        return {"total": len(results), "data": results}
+
+
+class JobScheduler:
+    """
+    Runs deep search jobs in the background, JOB_CONCURRENCY at a time.
+
+    Pages go through search_site, so they share the result cache, the per-host
+    rate limits and admission control with interactive requests; a page shed by
+    admission is retried after its Retry-After instead of failing the job.
+
+    A job runs in the worker that accepted it, but its progress is written to the
+    shared cache tier as pages arrive (its merged results every JOB_RESULTS_INTERVAL
+    and at the end), so any worker can answer GET and DELETE.
+    """
+
+    def __init__(self, concurrency=JOB_CONCURRENCY, max_queued=JOB_MAX_QUEUED, ttl=JOB_TTL):
+        self.max_queued = max_queued
+        # Job progress by id, ("results", id) merged results and ("cancel", id) flags
+        # for jobs running in another worker
+        self._states = make_cache("jobs", ttl=ttl, maxsize=1024, l1=False)
+        self._jobs = {}
+        self._running = set()
+        self._semaphore = None
+        self._concurrency = concurrency
+        self.waiting = 0
+        self.active = 0
+
+    def submit(self, job):
+        """Queue a job; raises OverloadedError when too many are already waiting."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._concurrency)
+        if self.waiting >= self.max_queued:
+            raise OverloadedError()
+        self.waiting += 1
+        self._jobs[job.id] = job
+        self._save(job)
+        job.task = asyncio.create_task(self._run(job))
+        self._running.add(job.task)
+        job.task.add_done_callback(self._running.discard)
+        return job
+
+    def _save(self, job, results=False):
+        """Write a job's progress, and its results when asked or JOB_RESULTS_INTERVAL has passed."""
+        self._states.set(job.id, job.state())
+        now = time.monotonic()
+        if results or (job.fetched and now - job.saved >= JOB_RESULTS_INTERVAL):
+            job.saved = now
+            self._states.set(("results", job.id), job.results_state())
+
+    def get(self, job_id, offset=0, limit=None):
+        """
+        The job's state with its results paged, or None if unknown or expired.
+        Results of a job running in another worker are the ones it last saved.
+        """
+        job = self._jobs.get(job_id)
+        if job is not None:
+            state = {**job.state(), **job.results_state()}
+        else:
+            state = self._states.get(job_id)
+            if state is None:
+                return None
+            state = {**state, **(self._states.get(("results", job_id)) or {"total": 0, "data": []})}
+        return job_view(state, offset, limit)
+
+    def cancel(self, job_id):
+        """Cancel a job. Returns its status afterwards, or None if unknown or expired."""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            if not job.done:
+                job.task.cancel()
+            return "cancelled"
+        state = self._states.get(job_id)
+        if state is None:
+            return None
+        if state["status"] in ("done", "failed", "cancelled"):
+            return state["status"]
+        # Running in another worker, which checks the flag as its pages arrive
+        self._states.set(("cancel", job_id), True)
+        return "cancelling"
+
+    def _check_cancelled(self, job):
+        if self._states.get(("cancel", job.id)):
+            job.task.cancel()
+
+    async def _page(self, job, site, page, limit):
+        for attempt in range(JOB_OVERLOAD_RETRIES + 1):
+            try:
+                return await search_site(site, job.query, page, limit)
+            except OverloadedError as e:
+                if attempt == JOB_OVERLOAD_RETRIES:
+                    raise
+                await asyncio.sleep(e.retry_after)
+
+    async def _site(self, job, site, limit):
+        """Deep search one site, adding each page's rows to the job as it arrives."""
+        fetched = []
+
+        def on_page(page, data):
+            fetched.append(page)
+            job.fetched += 1
+            job.add(site, data.get("data") or [])
+            self._save(job)
+            self._check_cancelled(job)
+
+        try:
+            data = await search_pages(
+                site, job.query, job.pages, limit,
+                fetch=lambda page: self._page(job, site, page, limit), on_page=on_page,
+            )
+            if data is None:
+                job.errors[site] = "Website Blocked. Change IP or Website Domain."
+        except Exception as e:
+            job.errors[site] = str(e) or type(e).__name__
+        # Pages after the site's last one still count towards progress
+        job.fetched += job.pages - len(fetched)
+
+    async def _run(self, job):
+        try:
+            try:
+                await self._semaphore.acquire()
+            finally:
+                self.waiting -= 1
+            self.active += 1
+            try:
+                self._check_cancelled(job)
+                job.status = "running"
+                job.started = time.time()
+                self._save(job)
+                await asyncio.gather(*(self._site(job, site, limit) for site, limit in job.sites))
+                job.status = "done"
+            finally:
+                self.active -= 1
+                self._semaphore.release()
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+        except Exception as e:
+            traceback.print_exc()
+            job.status = "failed"
+            job.errors["job"] = str(e)
+        finally:
+            job.finished = time.time()
+            # Final state, readable for JOB_TTL from any worker
+            self._save(job, results=True)
+            del self._jobs[job.id]
+
+    def stats(self):
+        return {
+            "running": self.active,
+            "waiting": self.waiting,
+        }
+
+    async def stop(self):
+        tasks = list(self._running)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+scheduler = JobScheduler()
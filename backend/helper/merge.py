@@ -0,0 +1,85 @@
+import base64
+import binascii
+import heapq
+import re
+from itertools import islice
+
+_HEX_HASH = re.compile(r"^[0-9a-fA-F]{40}$")
+_BASE32_HASH = re.compile(r"^[A-Z2-7]{32}$", re.IGNORECASE)
+_PLACEHOLDER_HASH = "0" * 40
+
+AGGREGATES = {
+    "max": max,
+    "min": min,
+    "sum": lambda a, b: a + b,
+}
+
+
+def normalize_infohash(value):
+    """
+    Lowercase hex form of a BitTorrent v1 infohash, accepting hex or base32 input.
+    Returns None for missing, malformed or placeholder hashes.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if _BASE32_HASH.match(value):
+        try:
+            value = binascii.hexlify(base64.b32decode(value.upper())).decode()
+        except (binascii.Error, ValueError):
+            return None
+    if not _HEX_HASH.match(value):
+        return None
+    value = value.lower()
+    if value == _PLACEHOLDER_HASH:
+        return None
+    return value
+
+
+def merge_by_infohash(rows, aggregate="max"):
+    """
+    Collapse rows describing the same torrent into one record.
+
+    Rows are grouped by normalized infohash; the first row of a group supplies the
+    descriptive fields, seeders/leechers are combined with `aggregate` (max, min or
+    sum) and every (site, url) pair is kept in `sources`. Rows without a usable hash
+    are kept as records of their own. Order of first appearance is preserved.
+    """
+    combine = AGGREGATES[aggregate]
+    merged = {}
+    output = []
+    for row in rows:
+        infohash = normalize_infohash(row.get("hash"))
+        source = {"site": row.get("site"), "url": row.get("url")}
+        if infohash is None:
+            output.append({**row, "sources": [source]})
+            continue
+        record = merged.get(infohash)
+        if record is None:
+            record = merged[infohash] = {
+                **row,
+                "hash": infohash,
+                "sources": [source],
+            }
+            output.append(record)
+            continue
+        record["seeders"] = combine(record.get("seeders") or 0, row.get("seeders") or 0)
+        record["leechers"] = combine(record.get("leechers") or 0, row.get("leechers") or 0)
+        if source not in record["sources"]:
+            record["sources"].append(source)
+    return output
+
+
+def _seeders(row):
+    return row.get("seeders") or 0
+
+
+def top_k_merge(streams, limit=None, key=_seeders):
+    """
+    k-way heap merge of row lists that are each already sorted best-first by `key`.
+    Stops after `limit` rows, so ranking costs O(limit log k) instead of a full sort.
+    """
+    merged = heapq.merge(*streams, key=key, reverse=True)
+    if limit:
+        return list(islice(merged, limit))
+    return list(merged)
@@ -0,0 +1,74 @@
+import asyncio
+import os
+import traceback
+
+from fastapi.concurrency import run_in_threadpool
+
+from helper.rate_limit import HostBusy, low_priority
+
+
+# Opt-in: fetch page N+1 in the background after page N was served
+PREFETCH_ENABLED = os.environ.get("PREFETCH_ENABLED", "").lower() in ("1", "true", "yes")
+# Prefetches waiting or running at once; more are dropped rather than queued
+PREFETCH_MAX_PENDING = int(os.environ.get("PREFETCH_MAX_PENDING", 4))
+# Seconds to wait before prefetching, so the client's own follow-up requests go first
+PREFETCH_DELAY = float(os.environ.get("PREFETCH_DELAY", 0.5))
+
+
+class Prefetcher:
+    """
+    Background next-page fetches at low priority.
+
+    Work is deduplicated by key and bounded by PREFETCH_MAX_PENDING. Upstream
+    requests go through the host limiter at low priority, so a prefetch is dropped
+    when its host is busy, and pending prefetches are cancelled once the limit is
+    reached by newer ones.
+    """
+
+    def __init__(self, enabled=PREFETCH_ENABLED, max_pending=PREFETCH_MAX_PENDING, delay=PREFETCH_DELAY):
+        self.enabled = enabled
+        self.max_pending = max_pending
+        self.delay = delay
+        self._tasks = {}
+        self.stats = {"scheduled": 0, "done": 0, "dropped": 0, "busy": 0}
+
+    def schedule(self, key, fetch):
+        """Run fetch() in the threadpool after the delay unless the same key is pending."""
+        if not self.enabled or key in self._tasks:
+            return
+        if len(self._tasks) >= self.max_pending:
+            # Under load: the oldest pending guess is the least likely to be useful now
+            oldest = next(iter(self._tasks))
+            self._tasks.pop(oldest).cancel()
+            self.stats["dropped"] += 1
+        self.stats["scheduled"] += 1
+        self._tasks[key] = asyncio.create_task(self._run(key, fetch))
+
+    async def _run(self, key, fetch):
+        def run():
+            with low_priority():
+                return fetch()
+
+        try:
+            await asyncio.sleep(self.delay)
+            await run_in_threadpool(run)
+            self.stats["done"] += 1
+        except HostBusy:
+            self.stats["busy"] += 1
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            traceback.print_exc()
+        finally:
+            if self._tasks.get(key) is asyncio.current_task():
+                del self._tasks[key]
+
+    async def stop(self):
+        tasks = list(self._tasks.values())
+        self._tasks.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+prefetcher = Prefetcher()
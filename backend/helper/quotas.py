@@ -0,0 +1,124 @@
+import contextvars
+import math
+import os
+import time
+
+from helper.cache import TTLCache
+
+
+# Default sustained requests per second and burst size for each API key
+API_KEY_RATE = float(os.environ.get("API_KEY_RATE", 2))
+API_KEY_BURST = int(os.environ.get("API_KEY_BURST", 30))
+# Per client IP quota of keyless requests to routes open to anonymous callers
+# (the frontend and EventSource streams); 0 requires a key there too
+API_ANON_RATE = float(os.environ.get("API_ANON_RATE", 1))
+API_ANON_BURST = int(os.environ.get("API_ANON_BURST", 20))
+# Seconds an idle client IP's bucket is kept
+API_ANON_IDLE = 600
+
+# The key of the request being served, set by authenticate_request
+current_key = contextvars.ContextVar("current_key", default=None)
+
+
+class KeyQuota:
+    """
+    Token bucket and usage counters of one API key; rate None means unlimited.
+
+    Buckets live in process memory: with several workers each enforces its own
+    share, so the effective rate is WEB_CONCURRENCY times the configured one.
+    """
+
+    __slots__ = ("name", "rate", "burst", "tokens", "updated", "counters")
+
+    def __init__(self, name, rate=API_KEY_RATE, burst=API_KEY_BURST):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst or 0)
+        self.updated = time.monotonic()
+        self.counters = {"requests": 0, "throttled": 0, "scrapes": 0, "cache_hits": 0}
+
+    def take(self, cost=1, request=True):
+        """
+        Spend `cost` tokens, counted as a request unless `request` is False (the extra
+        cost of a request already counted). Returns 0 when allowed, else the seconds
+        until it would be.
+        """
+        if self.rate is None:
+            self.counters["requests"] += request
+            return 0
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            self.counters["requests"] += request
+            return 0
+        self.counters["throttled"] += 1
+        return (cost - self.tokens) / self.rate if self.rate > 0 else math.inf
+
+    def usage(self):
+        tokens = None
+        if self.rate is not None:
+            tokens = int(min(self.burst, self.tokens + (time.monotonic() - self.updated) * self.rate))
+        return {
+            "key": self.name,
+            "rate": self.rate,
+            "burst": self.burst,
+            "tokens": tokens,
+            **self.counters,
+        }
+
+
+def parse_keys(value):
+    """
+    Parse PYTORRENT_API_KEYS: comma separated `key[:rate[:burst]]` entries, e.g.
+    "frontend:10:100,partner-a:1". Keys are named by their first 4 characters in usage output.
+    """
+    quotas = {}
+    for entry in value.split(","):
+        parts = entry.strip().split(":")
+        if not parts[0]:
+            continue
+        rate = float(parts[1]) if len(parts) > 1 and parts[1] else API_KEY_RATE
+        burst = int(parts[2]) if len(parts) > 2 and parts[2] else max(API_KEY_BURST, math.ceil(rate))
+        quotas[parts[0]] = KeyQuota(parts[0][:4] + "...", rate, burst)
+    return quotas
+
+
+quotas = parse_keys(os.environ.get("PYTORRENT_API_KEYS", ""))
+# Keyless callers of the open routes are only metered once PYTORRENT_API_KEYS hands out
+# quotas; the legacy single key alone leaves them as open as before
+anonymous_metered = bool(quotas)
+# The original single shared key stays unlimited unless PYTORRENT_API_KEYS gives it a quota
+if os.environ.get("PYTORRENT_API_KEY"):
+    quotas.setdefault(
+        os.environ["PYTORRENT_API_KEY"],
+        KeyQuota(os.environ["PYTORRENT_API_KEY"][:4] + "...", rate=None, burst=None),
+    )
+
+# Buckets of keyless callers by client IP
+_anonymous = TTLCache(ttl=API_ANON_IDLE, maxsize=10000)
+
+
+def anonymous_quota(ip):
+    """
+    The bucket of a keyless client IP, or None when anonymous access is disabled.
+    Behind a proxy the IP is only the client's when the server trusts its forwarded
+    headers (FORWARDED_ALLOW_IPS), otherwise every caller shares the proxy's bucket.
+    """
+    if API_ANON_RATE <= 0:
+        return None
+    quota = _anonymous.get(ip)
+    if quota is None:
+        quota = KeyQuota(f"anonymous:{ip}", API_ANON_RATE, API_ANON_BURST)
+    # Set on every use so the idle expiry starts from the last request
+    _anonymous.set(ip, quota)
+    return quota
+
+
+def record(counter):
+    """Count a scrape or cache hit against the key of the current request, if any."""
+    quota = current_key.get()
+    if quota is not None:
+        quota.counters[counter] += 1
@@ -0,0 +1,91 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+
+# Concurrent upstream requests allowed per host
+HOST_MAX_CONCURRENCY = int(os.environ.get("HOST_MAX_CONCURRENCY", 6))
+# Minimum spacing in seconds between two request starts to the same host
+HOST_MIN_INTERVAL = float(os.environ.get("HOST_MIN_INTERVAL", 0.1))
+
+# Set by low_priority() for the current thread
+_local = threading.local()
+
+
+class HostBusy(Exception):
+    """Raised to low priority work instead of waiting for a busy host."""
+
+
+@contextmanager
+def low_priority():
+    """
+    Run the block's upstream requests at low priority: they only start when the
+    host is idle and raise HostBusy instead of queueing behind other requests.
+    """
+    _local.low = True
+    try:
+        yield
+    finally:
+        _local.low = False
+
+
+class _Host:
+    __slots__ = ("semaphore", "lock", "next_start")
+
+    def __init__(self, concurrency):
+        self.semaphore = threading.BoundedSemaphore(concurrency)
+        self.lock = threading.Lock()
+        self.next_start = 0.0
+
+
+class HostLimiter:
+    """
+    Per-host concurrency cap and request spacing shared by every scraper thread,
+    so batch, combo and background work queue fairly instead of hammering a site.
+    """
+
+    def __init__(self, concurrency=HOST_MAX_CONCURRENCY, interval=HOST_MIN_INTERVAL):
+        self.concurrency = concurrency
+        self.interval = interval
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _host(self, url):
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None:
+                state = self._hosts[host] = _Host(self.concurrency)
+            return state
+
+    def _wait_turn(self, state):
+        with state.lock:
+            now = time.monotonic()
+            start = max(now, state.next_start)
+            state.next_start = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+    @contextmanager
+    def slot(self, url):
+        """Block until a request to url's host may start, and hold the slot while it runs."""
+        state = self._host(url)
+        if getattr(_local, "low", False):
+            with state.lock:
+                idle = state.next_start <= time.monotonic()
+            if not idle or not state.semaphore.acquire(blocking=False):
+                raise HostBusy(url)
+            try:
+                self._wait_turn(state)
+                yield
+            finally:
+                state.semaphore.release()
+            return
+        with state.semaphore:
+            self._wait_turn(state)
+            yield
+
+
+host_limiter = HostLimiter()
@@ -0,0 +1,183 @@
+import re
+import unicodedata
+from functools import lru_cache
+
+FIELDS = ("title", "year", "season", "episode", "resolution", "codec", "source", "group")
+
+_YEAR = re.compile(r"(?<![0-9])[\[(]?((?:19|20)\d{2})[\])]?(?![0-9])")
+_EPISODE = re.compile(
+    r"\bS(?P<season>\d{1,2})[ .]?E(?P<episode>\d{1,3})\b"
+    r"|\b(?P<season_x>\d{1,2})x(?P<episode_x>\d{2,3})\b"
+    r"|\bS(?P<season_only>\d{1,2})\b"
+    r"|\bSeason[ .]?(?P<season_word>\d{1,2})\b",
+    re.IGNORECASE,
+)
+_RESOLUTION = re.compile(r"\b(2160|1440|1080|720|576|480)[pi]\b|\b(4K|UHD)\b", re.IGNORECASE)
+_CODECS = (
+    (re.compile(r"\b(?:x|h)[ .]?265\b|\bHEVC\b", re.IGNORECASE), "H.265"),
+    (re.compile(r"\b(?:x|h)[ .]?264\b|\bAVC\b", re.IGNORECASE), "H.264"),
+    (re.compile(r"\bAV1\b", re.IGNORECASE), "AV1"),
+    (re.compile(r"\bVP9\b", re.IGNORECASE), "VP9"),
+    (re.compile(r"\bXviD\b", re.IGNORECASE), "XviD"),
+    (re.compile(r"\bDivX\b", re.IGNORECASE), "DivX"),
+)
+_SOURCES = (
+    (re.compile(r"\bWEB[ .-]?DL\b", re.IGNORECASE), "WEB-DL"),
+    (re.compile(r"\bWEB[ .-]?Rip\b", re.IGNORECASE), "WEBRip"),
+    (re.compile(r"\bBlu[ .-]?Ray\b|\bBDRip\b|\bBRRip\b|\bBDRemux\b|\bRemux\b", re.IGNORECASE), "BluRay"),
+    (re.compile(r"\bHDRip\b", re.IGNORECASE), "HDRip"),
+    (re.compile(r"\bHDTV\b", re.IGNORECASE), "HDTV"),
+    (re.compile(r"\bDVD[ .-]?Rip\b|\bDVDR?\b|\bDVD5\b|\bDVD9\b", re.IGNORECASE), "DVD"),
+    (re.compile(r"\bHD[ .-]?CAM\b|\bCAM(?:Rip)?\b|\bTELESYNC\b|\bHDTS\b|\bTS\b", re.IGNORECASE), "CAM"),
+    (re.compile(r"\bWEB\b", re.IGNORECASE), "WEB-DL"),
+)
+_GROUP = re.compile(r"-\s*([A-Za-z0-9]+)\s*(?:\[[^\]]*\])?\s*$")
+_EXTENSION = re.compile(r"\.(mkv|mp4|avi|mov|wmv|flv|webm|m4v)$", re.IGNORECASE)
+_SEPARATORS = re.compile(r"[._]+")
+_BRACKETS = re.compile(r"[\[\](){}]")
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+_LEADING_ARTICLE = re.compile(r"^(?:the|a|an) ")
+
+
+def _earliest(*positions):
+    found = [p for p in positions if p is not None]
+    return min(found) if found else None
+
+
+@lru_cache(maxsize=16384)
+def _parse(name):
+    cleaned = _EXTENSION.sub("", name.strip())
+
+    group_match = _GROUP.search(cleaned)
+    group = group_match.group(1) if group_match else None
+
+    # Codecs are matched before dots become spaces so "H.264" stays one token
+    codec = None
+    codec_at = None
+    for pattern, label in _CODECS:
+        match = pattern.search(cleaned)
+        if match:
+            codec, codec_at = label, match.start()
+            break
+
+    spaced = _SEPARATORS.sub(" ", cleaned)
+
+    season = episode = None
+    episode_at = None
+    match = _EPISODE.search(spaced)
+    if match:
+        episode_at = match.start()
+        season = (
+            match.group("season")
+            or match.group("season_x")
+            or match.group("season_only")
+            or match.group("season_word")
+        )
+        episode = match.group("episode") or match.group("episode_x")
+        season = int(season)
+        episode = int(episode) if episode else None
+
+    resolution = None
+    resolution_at = None
+    match = _RESOLUTION.search(spaced)
+    if match:
+        resolution = f"{match.group(1)}p" if match.group(1) else "2160p"
+        resolution_at = match.start()
+
+    source = None
+    source_at = None
+    for pattern, label in _SOURCES:
+        match = pattern.search(spaced)
+        if match:
+            source, source_at = label, match.start()
+            break
+
+    # The year is the last one before any other marker, so titles like "1917 2019" keep "1917"
+    marker_at = _earliest(episode_at, resolution_at, source_at)
+    year = None
+    year_at = None
+    for match in _YEAR.finditer(spaced):
+        if match.start() == 0 or (marker_at is not None and match.start() > marker_at):
+            continue
+        year, year_at = int(match.group(1)), match.start()
+
+    title_end = _earliest(year_at, marker_at)
+    if codec_at is not None and title_end is None:
+        title_end = len(_SEPARATORS.sub(" ", cleaned[:codec_at]))
+    title = spaced[:title_end] if title_end is not None else spaced
+    if group_match and title_end is None:
+        title = _SEPARATORS.sub(" ", cleaned[:group_match.start()])
+    title = " ".join(_BRACKETS.sub(" ", title).split()).strip(" -")
+
+    return (title or None, year, season, episode, resolution, codec, source, group)
+
+
+@lru_cache(maxsize=16384)
+def title_key(title):
+    """
+    Normalized lookup key for a title.
+
+    Args:
+        title (str): Movie title or parsed release title, e.g. "The Lord of the Rings: The Two Towers"
+
+    Returns:
+        str: Lowercase ASCII words without punctuation or a leading article,
+             e.g. "lord of the rings the two towers"
+    """
+    if not title:
+        return ""
+    ascii_title = unicodedata.normalize("NFKD", title).encode("ascii", "ignore").decode()
+    key = _NON_WORD.sub(" ", ascii_title.lower().replace("&", " and ")).strip()
+    return _LEADING_ARTICLE.sub("", key)
+
+
+def parse_release_name(name):
+    """
+    Extract structured quality metadata from a torrent release name.
+
+    Args:
+        name (str): Release name, e.g. "Dune.Part.Two.2024.2160p.WEB-DL.x265-GROUP"
+
+    Returns:
+        dict: title, year, season, episode, resolution, codec, source and group
+              (None where the name does not say)
+    """
+    if not name:
+        return dict.fromkeys(FIELDS)
+    return dict(zip(FIELDS, _parse(name)))
+
+
+def parse_release_names(names):
+    """
+    Parse many release names at once.
+
+    Args:
+        names (iterable): Release names
+
+    Returns:
+        dict: name -> parsed metadata, each distinct name parsed once
+    """
+    return {name: parse_release_name(name) for name in dict.fromkeys(names)}
+
+
+def filter_by_release(rows, **criteria):
+    """
+    Keep rows whose parsed release metadata matches every given field.
+
+    Args:
+        rows (list): Torrent records carrying a "release" dict
+        **criteria: Field values to match, e.g. resolution="1080p"; None values are ignored
+
+    Returns:
+        list: Matching rows
+    """
+    criteria = {k: str(v).lower() for k, v in criteria.items() if v is not None}
+    if not criteria:
+        return rows
+    return [
+        row for row in rows
+        if all(
+            str((row.get("release") or {}).get(field)).lower() == value
+            for field, value in criteria.items()
+        )
+    ]
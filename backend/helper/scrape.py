@@ -0,0 +1,77 @@
+import os
+
+from fastapi.concurrency import run_in_threadpool
+
+from helper.admission import OverloadedError, admission
+from helper.cache import TTLCache, make_cache
+from helper.is_site_available import check_if_site_available
+from helper.prefetch import prefetcher
+from helper.quotas import record
+
+
+# Search results shared by /search, /all/search and /search/batch, keyed by (site, query, page, limit)
+_search_cache = make_cache("search", ttl=int(os.environ.get("SEARCH_CACHE_TTL", 300)), maxsize=2048)
+# Last good result of each search, served marked stale when admission sheds the scrape
+_stale_search = TTLCache(ttl=int(os.environ.get("SEARCH_STALE_TTL", 3600)), maxsize=2048)
+
+
+class _Missed(Exception):
+    """Raised instead of scraping by a request that only joined another's fetch."""
+
+
+def _join():
+    raise _Missed()
+
+
+def _search_key(site, query, page, limit):
+    return (site, " ".join(query.lower().split()), page, limit)
+
+
+async def search_site(site, query, page=1, limit=50):
+    """
+    Run one site's search through the shared result cache.
+    Concurrent identical searches share a single scrape; failed scrapes (None) are not cached.
+    Cache misses go through admission control: when it is saturated the last good
+    result is returned with "stale": True, or OverloadedError is raised.
+    """
+    key = _search_key(site, query, page, limit)
+    data = _search_cache.get(key)
+    if data is not None:
+        record("cache_hits")
+        return data
+    scraper_class = check_if_site_available(site)[site]["website"]
+    fetch = lambda: scraper_class().search(query, page, limit)
+    if _search_cache.pending(key):
+        # Another request is already scraping this: waiting for it costs no upstream slot.
+        # Should that fetch fail, this request scrapes below, through admission
+        try:
+            data = await run_in_threadpool(_search_cache.get_or_set, key, _join)
+            record("cache_hits")
+            return data
+        except _Missed:
+            pass
+    record("scrapes")
+    try:
+        async with admission.admit():
+            data = await run_in_threadpool(_search_cache.get_or_set, key, fetch)
+    except OverloadedError:
+        stale = _stale_search.get(key)
+        if stale is None:
+            raise
+        return {**stale, "stale": True}
+    if data is not None:
+        _stale_search.set(key, data)
+    return data
+
+
+def prefetch_search(site, query, page, limit):
+    """Warm the result cache with the page after `page` of a search, if prefetching is on."""
+    if not prefetcher.enabled or admission.saturated():
+        return
+    key = _search_key(site, query, page + 1, limit)
+    if _search_cache.get(key) is not None:
+        return
+    scraper_class = check_if_site_available(site)[site]["website"]
+    prefetcher.schedule(("search",) + key, lambda: _search_cache.get_or_set(
+        key, lambda: scraper_class().search(query, page + 1, limit)
+    ))
@@ -0,0 +1,103 @@
+import json
+from contextvars import ContextVar
+from urllib.parse import parse_qs
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional wire format
+    msgpack = None
+
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+# Keys whose list values hold torrent rows that ?fields= projects
+ROW_LISTS = frozenset(("data", "added"))
+
+# (wire format, projected fields) negotiated for the current request
+_wire = ContextVar("wire", default=("json", None))
+
+
+def wire_format():
+    """(format, fields) negotiated for the current request, usable as part of a cache key."""
+    return _wire.get()
+
+
+def negotiate(accept, fields):
+    """Pick the wire format from an Accept header and parse a comma separated ?fields= value."""
+    negotiated = "json"
+    if msgpack is not None and accept and any(m in accept for m in MSGPACK_MEDIA_TYPES):
+        negotiated = "msgpack"
+    projected = None
+    if fields:
+        projected = tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip())) or None
+    return negotiated, projected
+
+
+def project(content, fields):
+    """Keep only `fields` in every row of the row lists found anywhere in content."""
+    if isinstance(content, dict):
+        return {
+            key: [{f: row[f] for f in fields if f in row} for row in value]
+            if key in ROW_LISTS and isinstance(value, list) and value and isinstance(value[0], dict)
+            else project(value, fields)
+            for key, value in content.items()
+        }
+    if isinstance(content, list):
+        return [project(value, fields) for value in content]
+    return content
+
+
+def dumps(content):
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class APIResponse(JSONResponse):
+    """
+    Default response class: orjson when installed, MessagePack when the client
+    asks for it in Accept, and ?fields= projection of torrent rows.
+    """
+
+    def __init__(self, content, status_code=200, headers=None, media_type=None, background=None):
+        super().__init__(content, status_code, headers, media_type, background)
+        self.headers.append("Vary", "Accept")
+
+    def render(self, content):
+        wire_format, fields = _wire.get()
+        if fields:
+            content = project(content, fields)
+        if wire_format == "msgpack":
+            self.media_type = MSGPACK_MEDIA_TYPES[0]
+            return msgpack.packb(content, use_bin_type=True)
+        return dumps(content)
+
+
+class WireFormatMiddleware:
+    """Negotiates the wire format and field projection once per request for APIResponse."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        accept = ""
+        for name, value in scope["headers"]:
+            if name == b"accept":
+                accept = value.decode("latin-1")
+                break
+        fields = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("fields", [None])[0]
+        token = _wire.set(negotiate(accept, fields))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _wire.reset(token)
@@ -0,0 +1,139 @@
+import heapq
+import os
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from urllib.parse import quote
+
+from helper.merge import normalize_infohash
+from helper.release_parser import parse_release_name
+
+
+# Samples kept per torrent (oldest dropped first)
+MAX_SAMPLES = int(os.environ.get("TIMESERIES_MAX_SAMPLES", 96))
+# Torrents tracked before the least recently seen are evicted
+MAX_TORRENTS = int(os.environ.get("TIMESERIES_MAX_TORRENTS", 20000))
+# Samples closer together than this overwrite the previous one instead of appending
+MIN_SAMPLE_GAP = int(os.environ.get("TIMESERIES_MIN_SAMPLE_GAP", 60))
+# Window over which seeder velocity is measured for trending
+TRENDING_WINDOW = int(os.environ.get("TRENDING_WINDOW", 6 * 3600))
+
+
+class Series:
+    """
+    Seeder/leecher samples of one torrent in parallel typed arrays, with only the
+    hash, name and site of its row; the rest of a listed row is derived from them.
+    """
+
+    __slots__ = ("first_seen", "category_id", "hash", "name", "site", "times", "seeders", "leechers")
+
+    def __init__(self, now, category_id, infohash, name, site):
+        self.first_seen = now
+        self.category_id = category_id
+        self.hash = infohash
+        self.name = name
+        self.site = site
+        self.times = array("d")
+        self.seeders = array("L")
+        self.leechers = array("L")
+
+    def add(self, now, seeders, leechers):
+        if self.times and now - self.times[-1] < MIN_SAMPLE_GAP:
+            self.seeders[-1] = seeders
+            self.leechers[-1] = leechers
+            return
+        self.times.append(now)
+        self.seeders.append(seeders)
+        self.leechers.append(leechers)
+        if len(self.times) > MAX_SAMPLES:
+            del self.times[0], self.seeders[0], self.leechers[0]
+
+    def velocity(self, now, window):
+        """Seeders gained per hour over the window, or None with fewer than two samples in it."""
+        start = now - window
+        base = None
+        for i, sample_time in enumerate(self.times):
+            if sample_time >= start:
+                base = i
+                break
+        if base is None or base == len(self.times) - 1:
+            return None
+        hours = (self.times[-1] - self.times[base]) / 3600
+        if hours <= 0:
+            return None
+        return (self.seeders[-1] - self.seeders[base]) / hours
+
+    def row(self):
+        return {
+            "name": self.name,
+            "site": self.site,
+            "hash": self.hash,
+            "magnet": f"magnet:?xt=urn:btih:{self.hash}&dn={quote(self.name or '')}",
+            "seeders": self.seeders[-1] if self.seeders else 0,
+            "leechers": self.leechers[-1] if self.leechers else 0,
+            "release": parse_release_name(self.name),
+            "first_seen": self.first_seen,
+        }
+
+
+class TimeSeriesStore:
+    """
+    Seeder/leecher history per infohash, fed by every browse page Pirate Bay returns.
+    Powers local trending (seeder velocity) and recent (first seen) lists.
+    """
+
+    def __init__(self):
+        self._series = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, rows, category_id=None, site=None):
+        now = time.time()
+        with self._lock:
+            for row in rows:
+                # Hex and base32 reports of the same torrent share one series
+                infohash = normalize_infohash(row.get("hash"))
+                if not infohash:
+                    continue
+                series = self._series.get(infohash)
+                if series is None:
+                    series = self._series[infohash] = Series(now, category_id, infohash, row.get("name"), site)
+                else:
+                    series.name = row.get("name") or series.name
+                    if category_id is not None:
+                        series.category_id = category_id
+                    self._series.move_to_end(infohash)
+                series.add(now, row.get("seeders") or 0, row.get("leechers") or 0)
+            while len(self._series) > MAX_TORRENTS:
+                self._series.popitem(last=False)
+
+    def _candidates(self, category_id):
+        with self._lock:
+            series = list(self._series.values())
+        if category_id is None:
+            return series
+        return [s for s in series if s.category_id == category_id]
+
+    def trending(self, limit, category_id=None, window=TRENDING_WINDOW):
+        now = time.time()
+        scored = []
+        for series in self._candidates(category_id):
+            velocity = series.velocity(now, window)
+            if velocity is not None and velocity > 0:
+                scored.append((velocity, series))
+        top = heapq.nlargest(limit, scored, key=lambda item: item[0])
+        return [{**series.row(), "velocity": round(velocity, 2)} for velocity, series in top]
+
+    def recent(self, limit, category_id=None):
+        top = heapq.nlargest(
+            limit,
+            self._candidates(category_id),
+            key=lambda s: (s.first_seen, s.seeders[-1] if s.seeders else 0),
+        )
+        return [series.row() for series in top]
+
+    def __len__(self):
+        return len(self._series)
+
+
+timeseries = TimeSeriesStore()
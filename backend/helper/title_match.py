@@ -0,0 +1,64 @@
+from difflib import SequenceMatcher
+
+from helper.release_parser import title_key
+from helper.torrent_index import torrent_index
+
+
+# Minimum title similarity for a fuzzy (non exact key) match
+FUZZY_THRESHOLD = 0.85
+# Quality tiers reported per title, anything below 720p is "sd"
+TIERS = ("2160p", "1080p", "720p", "sd")
+
+
+def _tier(resolution):
+    return resolution if resolution in TIERS else "sd"
+
+
+def _score(key, row, year):
+    """Title similarity weighted by how well the release year agrees (0..1)."""
+    release = row["release"]
+    if release["season"] is not None:
+        return 0.0
+    similarity = 1.0 if row["title_key"] == key else SequenceMatcher(
+        None, key, row["title_key"] or ""
+    ).ratio()
+    if similarity < FUZZY_THRESHOLD:
+        return 0.0
+    if year is None or release["year"] is None:
+        return similarity * 0.9
+    if release["year"] == year:
+        return similarity
+    if abs(release["year"] - year) == 1:
+        return similarity * 0.85
+    return 0.0
+
+
+def match_title(title, year=None):
+    """
+    Best local torrent for a movie in each quality tier.
+
+    Exact normalized-title lookups are tried first; a full-text search with fuzzy
+    scoring is only used when the exact key has no match. Within a tier the best
+    scored, then best seeded, torrent wins.
+    """
+    key = title_key(title)
+    if not key:
+        return {}
+    scored = [(_score(key, row, year), row) for row in torrent_index.by_title_key(key)]
+    scored = [(score, row) for score, row in scored if score > 0]
+    if not scored:
+        scored = [(_score(key, row, year), row) for row in torrent_index.search(key, limit=200)]
+        scored = [(score, row) for score, row in scored if score > 0]
+
+    best = {}
+    for score, row in scored:
+        tier = _tier(row["release"]["resolution"])
+        current = best.get(tier)
+        if current is None or (score, row["seeders"]) > (current[0], current[1]["seeders"]):
+            best[tier] = (score, row)
+    matches = {}
+    for tier in TIERS:
+        if tier in best:
+            score, row = best[tier]
+            matches[tier] = {**row, "score": round(score, 3)}
+    return matches
@@ -0,0 +1,329 @@
+import asyncio
+import json
+import os
+import random
+import time
+from collections import deque
+
+from fastapi.concurrency import run_in_threadpool
+
+from helper.cache import make_cache
+from helper.is_site_available import PirateBay, check_if_site_available
+
+
+# Seconds between two full refresh cycles (0 disables the refresher)
+REFRESH_INTERVAL = int(os.environ.get("TOP100_REFRESH_INTERVAL", 900))
+# No background refresher under Lambda: Mangum runs the lifespan, and so would start
+# and cancel it, on every invocation. Requests there go live through the browse cache
+REFRESH_IN_BACKGROUND = not os.environ.get("AWS_LAMBDA_FUNCTION_NAME")
+# Random +/- fraction applied to every sleep so workers don't refresh in lockstep
+REFRESH_JITTER = float(os.environ.get("TOP100_REFRESH_JITTER", 0.2))
+# Minimum gap in seconds between two category scrapes (upstream rate limit)
+MIN_FETCH_GAP = float(os.environ.get("TOP100_MIN_FETCH_GAP", 5))
+# Snapshots older than this are considered stale and bypassed
+MAX_AGE = int(os.environ.get("TOP100_SNAPSHOT_MAX_AGE", max(REFRESH_INTERVAL, 300) * 3))
+# Number of past versions kept per category for /diff?since=<version>
+HISTORY_SIZE = int(os.environ.get("TOP100_SNAPSHOT_HISTORY", 12))
+# Seconds between checks of the shared tier for snapshots refreshed by another worker
+SYNC_INTERVAL = float(os.environ.get("TOP100_SYNC_INTERVAL", 10))
+# Pending pushes per subscriber before a slow client is dropped
+SUBSCRIBER_QUEUE_SIZE = 16
+SNAPSHOT_LIMIT = 100
+
+FIELDS = (
+    "name",
+    "size",
+    "seeders",
+    "leechers",
+    "uploader",
+    "url",
+    "date",
+    "language",
+    "hash",
+    "magnet",
+    "release",
+)
+
+_HASH = FIELDS.index("hash")
+_SEEDERS = FIELDS.index("seeders")
+_LEECHERS = FIELDS.index("leechers")
+
+
+# Latest scraped snapshot of each category, shared by every worker through the cache
+# tier: one worker scrapes a stale category under the tier's lease, the others adopt
+# its rows and version, so versions, ETags and deltas agree across workers
+_shared = make_cache("top100", ttl=int(max(REFRESH_INTERVAL // 2, MIN_FETCH_GAP)), maxsize=64)
+
+
+def _jitter(seconds):
+    return seconds * random.uniform(1 - REFRESH_JITTER, 1 + REFRESH_JITTER)
+
+
+class Snapshot:
+    """Top 100 rows of one category, stored as tuples in FIELDS order."""
+
+    __slots__ = ("category", "category_id", "version", "rows", "created", "time", "bodies", "_ranks")
+
+    def __init__(self, category, category_id, data, scrape_time=0, version=0):
+        self.category = category
+        self.category_id = category_id
+        self.version = version
+        self.rows = tuple(tuple(row.get(field) for field in FIELDS) for row in data)
+        self.created = time.time()
+        self.time = scrape_time
+        # Rendered and compressed response bodies, see helper.compression.cached_response
+        self.bodies = {}
+        self._ranks = None
+
+    @property
+    def ranks(self):
+        """Map of infohash -> (rank, row) built on first use."""
+        if self._ranks is None:
+            self._ranks = {
+                row[_HASH].lower(): (rank, row)
+                for rank, row in enumerate(self.rows, 1)
+                if row[_HASH]
+            }
+        return self._ranks
+
+    @property
+    def age(self):
+        return time.time() - self.created
+
+    def data(self, limit=SNAPSHOT_LIMIT):
+        return [dict(zip(FIELDS, row)) for row in self.rows[:limit]]
+
+
+def diff(old, new):
+    """
+    Rows added, removed and changed between two snapshots, keyed by infohash.
+    Changed rows only carry the hash, rank, seeders and leechers.
+    """
+    old_ranks, new_ranks = old.ranks, new.ranks
+    added, changed = [], []
+    for infohash, (rank, row) in new_ranks.items():
+        previous = old_ranks.get(infohash)
+        if previous is None:
+            added.append({**dict(zip(FIELDS, row)), "rank": rank})
+            continue
+        old_rank, old_row = previous
+        if (
+            rank != old_rank
+            or row[_SEEDERS] != old_row[_SEEDERS]
+            or row[_LEECHERS] != old_row[_LEECHERS]
+        ):
+            changed.append({
+                "hash": row[_HASH],
+                "rank": rank,
+                "previous_rank": old_rank,
+                "seeders": row[_SEEDERS],
+                "leechers": row[_LEECHERS],
+            })
+    removed = [old_ranks[h][1][_HASH] for h in old_ranks.keys() - new_ranks.keys()]
+    return {"added": added, "removed": removed, "changed": changed}
+
+
+def sse_frame(event, version, payload):
+    """Encode one server-sent event. Encoded once per refresh and shared by every subscriber."""
+    data = json.dumps(payload, separators=(",", ":"))
+    return f"event: {event}\nid: {version}\ndata: {data}\n\n".encode()
+
+
+class SnapshotStore:
+    """
+    In-memory Top 100 snapshots for every Pirate Bay category, kept fresh by a background task.
+    Every worker runs the task, but each category is scraped by one worker per cycle through
+    the shared tier and adopted, with the same version, by the others.
+    """
+
+    def __init__(self):
+        self._snapshots = {}
+        self._history = {}
+        self._subscribers = {}
+        self._task = None
+        self._follow_task = None
+        self._last_fetch = 0.0
+        self._synced = {}
+
+    @staticmethod
+    def categories():
+        all_sites = check_if_site_available("piratebay")
+        return all_sites["piratebay"].get("top_100_categories", {})
+
+    def get(self, category):
+        self._sync(category)
+        snapshot = self._snapshots.get(category)
+        if snapshot is None or snapshot.age > MAX_AGE:
+            return None
+        return snapshot
+
+    def cached(self, category):
+        """A fresh snapshot another worker put in the shared tier, adopted now; never scrapes."""
+        self._adopt(category, _shared.get(category))
+        return self.get(category)
+
+    def latest(self, category):
+        """The last snapshot of a category whatever its age, for serving stale under load."""
+        return self._snapshots.get(category)
+
+    def version(self, category, version):
+        """Return the snapshot with this exact version if it is still in history."""
+        for snapshot in self._history.get(category, ()):
+            if snapshot.version == version:
+                return snapshot
+        return None
+
+    def subscribe(self, category):
+        """Register a subscriber for a category's deltas. Returns its queue of encoded frames."""
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.setdefault(category, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, category, queue):
+        subscribers = self._subscribers.get(category)
+        if subscribers is not None:
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[category]
+
+    def _publish(self, category, frame):
+        for queue in list(self._subscribers.get(category, ())):
+            try:
+                queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                # A client this far behind is closed; it reconnects and catches up through /diff
+                self.unsubscribe(category, queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    async def refresh(self, category, throttle=True):
+        """
+        Snapshot one category. Returns the new snapshot or None.
+        A snapshot another worker scraped within the last half interval is adopted instead.
+        """
+        category_id = self.categories()[category]
+
+        def scrape():
+            if throttle:
+                wait = MIN_FETCH_GAP - (time.monotonic() - self._last_fetch)
+                if wait > 0:
+                    time.sleep(wait)
+            self._last_fetch = time.monotonic()
+            data = PirateBay().top100_category(category_id, 1, SNAPSHOT_LIMIT)
+            return self._payload(category, category_id, data)
+
+        payload = await run_in_threadpool(_shared.get_or_set, category, scrape)
+        return self._adopt(category, payload)
+
+    def preload(self, categories):
+        """
+        Synchronously snapshot categories outside an event loop, e.g. in the preforked
+        master (serve.py) so workers start with them. Returns the number loaded.
+        """
+        available = self.categories()
+        loaded = 0
+        for category in categories:
+            if category not in available:
+                continue
+            data = PirateBay().top100_category(available[category], 1, SNAPSHOT_LIMIT)
+            payload = self._payload(category, available[category], data)
+            if payload is not None:
+                _shared.set(category, payload)
+                self._adopt(category, payload)
+                loaded += 1
+        return loaded
+
+    def fresh(self, category):
+        """True when a category was snapshotted less than half a refresh interval ago."""
+        snapshot = self._snapshots.get(category)
+        return snapshot is not None and snapshot.age < REFRESH_INTERVAL / 2
+
+    def _payload(self, category, category_id, data):
+        """Shared form of a freshly scraped category, or None if the scrape failed."""
+        if not data or not data.get("data"):
+            return None
+        previous = self._snapshots.get(category)
+        # Millisecond timestamps keep versions meaningful across restarts
+        version = int(time.time() * 1000)
+        if previous is not None and version <= previous.version:
+            version = previous.version + 1
+        return {
+            "category_id": category_id,
+            "data": data["data"],
+            "time": data.get("time", 0),
+            "version": version,
+            "created": time.time(),
+        }
+
+    def _adopt(self, category, payload):
+        """Make a shared payload the current snapshot unless it is already (or older than) it."""
+        if payload is None:
+            return None
+        previous = self._snapshots.get(category)
+        if previous is not None and previous.version >= payload["version"]:
+            return previous
+        version = payload["version"]
+        snapshot = Snapshot(category, payload["category_id"], payload["data"], payload["time"], version)
+        snapshot.created = payload["created"]
+        self._snapshots[category] = snapshot
+        self._history.setdefault(category, deque(maxlen=HISTORY_SIZE)).append(snapshot)
+        if previous is not None and self._subscribers.get(category):
+            self._publish(category, sse_frame("delta", version, {
+                "category": category,
+                "version": version,
+                "since": previous.version,
+                **diff(previous, snapshot),
+            }))
+        return snapshot
+
+    def _sync(self, category):
+        """Adopt a newer snapshot another worker put in the shared tier, at most every SYNC_INTERVAL."""
+        now = time.monotonic()
+        if now - self._synced.get(category, 0) < SYNC_INTERVAL:
+            return
+        self._synced[category] = now
+        self._adopt(category, _shared.get(category))
+
+    async def _follow(self):
+        """Push other workers' refreshes to this worker's stream subscribers."""
+        while True:
+            await asyncio.sleep(SYNC_INTERVAL)
+            for category in list(self._subscribers):
+                self._sync(category)
+
+    async def _run(self):
+        await asyncio.sleep(_jitter(MIN_FETCH_GAP))
+        while True:
+            categories = list(self.categories())
+            random.shuffle(categories)
+            for category in categories:
+                if self.fresh(category):
+                    # Refreshed recently, e.g. by the startup warm-up
+                    continue
+                try:
+                    await self.refresh(category)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print(f"Top100 snapshot refresh failed for {category}: {e}")
+            await asyncio.sleep(_jitter(REFRESH_INTERVAL))
+
+    def start(self):
+        if REFRESH_INTERVAL > 0 and REFRESH_IN_BACKGROUND and self._task is None:
+            self._task = asyncio.create_task(self._run())
+            self._follow_task = asyncio.create_task(self._follow())
+
+    async def stop(self):
+        for task in (self._task, self._follow_task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = None
+        self._follow_task = None
+
+
+snapshots = SnapshotStore()
@@ -0,0 +1,209 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from helper.release_parser import parse_release_name, parse_release_names, title_key
+
+
+# SQLite file holding every torrent any scraper has parsed (empty string disables the index)
+INDEX_PATH = os.environ.get(
+    "TORRENT_INDEX_PATH", os.path.join(tempfile.gettempdir(), "woztorrentz_index.db")
+)
+
+COLUMNS = (
+    "hash",
+    "name",
+    "size",
+    "seeders",
+    "leechers",
+    "uploader",
+    "url",
+    "date",
+    "language",
+    "magnet",
+    "site",
+    "title_key",
+    "year",
+    "season",
+    "resolution",
+)
+
+# Columns derived from the parsed release name, added to databases created before them
+_RELEASE_COLUMNS = {
+    "title_key": "TEXT",
+    "year": "INTEGER",
+    "season": "INTEGER",
+    "resolution": "TEXT",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS torrents (
+    hash TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    size TEXT,
+    seeders INTEGER NOT NULL DEFAULT 0,
+    leechers INTEGER NOT NULL DEFAULT 0,
+    uploader TEXT,
+    url TEXT,
+    date TEXT,
+    language TEXT,
+    magnet TEXT,
+    site TEXT,
+    title_key TEXT,
+    year INTEGER,
+    season INTEGER,
+    resolution TEXT,
+    updated REAL NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS torrents_fts USING fts5(
+    name, content='torrents', content_rowid='rowid'
+);
+CREATE TRIGGER IF NOT EXISTS torrents_ai AFTER INSERT ON torrents BEGIN
+    INSERT INTO torrents_fts(rowid, name) VALUES (new.rowid, new.name);
+END;
+CREATE TRIGGER IF NOT EXISTS torrents_ad AFTER DELETE ON torrents BEGIN
+    INSERT INTO torrents_fts(torrents_fts, rowid, name) VALUES ('delete', old.rowid, old.name);
+END;
+CREATE TRIGGER IF NOT EXISTS torrents_au AFTER UPDATE OF name ON torrents BEGIN
+    INSERT INTO torrents_fts(torrents_fts, rowid, name) VALUES ('delete', old.rowid, old.name);
+    INSERT INTO torrents_fts(rowid, name) VALUES (new.rowid, new.name);
+END;
+"""
+
+_UPSERT = f"""
+INSERT INTO torrents ({", ".join(COLUMNS)}, updated)
+VALUES ({", ".join("?" for _ in COLUMNS)}, ?)
+ON CONFLICT(hash) DO UPDATE SET
+    {", ".join(f"{c} = excluded.{c}" for c in COLUMNS if c != "hash")},
+    updated = excluded.updated
+"""
+
+# Limetorrents falls back to an all-zero hash when a row has no magnet
+_PLACEHOLDER_HASH = "0" * 40
+
+
+def _release_values(name):
+    release = parse_release_name(name)
+    return (title_key(release["title"]), release["year"], release["season"], release["resolution"])
+
+
+def _match_expression(query):
+    """Quote every word of a free-text query so FTS5 syntax characters are matched literally."""
+    terms = ['"' + term.replace('"', '""') + '"' for term in query.split()]
+    return " ".join(terms)
+
+
+class TorrentIndex:
+    """
+    Local full-text index of scraped torrents keyed by infohash.
+    Scrapers upsert every parsed row; /api/v1/search?source=local answers from it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        # A connection opened before a fork (preloaded app) must not be used by the workers
+        if self._conn is None or self._pid != os.getpid():
+            self._pid = os.getpid()
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._migrate(conn)
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _migrate(conn):
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(torrents)")}
+        missing = [c for c in _RELEASE_COLUMNS if c not in existing]
+        with conn:
+            for column in missing:
+                conn.execute(f"ALTER TABLE torrents ADD COLUMN {column} {_RELEASE_COLUMNS[column]}")
+            if missing:
+                rows = conn.execute("SELECT rowid, name FROM torrents").fetchall()
+                conn.executemany(
+                    "UPDATE torrents SET title_key = ?, year = ?, season = ?, resolution = ? WHERE rowid = ?",
+                    [_release_values(name) + (rowid,) for rowid, name in rows],
+                )
+            conn.execute("CREATE INDEX IF NOT EXISTS torrents_title_key ON torrents(title_key)")
+
+    def upsert(self, rows, site):
+        if not self.path or not rows:
+            return
+        now = time.time()
+        params = []
+        for row in rows:
+            infohash = (row.get("hash") or "").lower()
+            if not infohash or infohash == _PLACEHOLDER_HASH or not row.get("name"):
+                continue
+            values = {**row, "hash": infohash, "site": site}
+            values.update(zip(_RELEASE_COLUMNS, _release_values(row["name"])))
+            values["seeders"] = values.get("seeders") or 0
+            values["leechers"] = values.get("leechers") or 0
+            params.append(tuple(values.get(c) for c in COLUMNS) + (now,))
+        if not params:
+            return
+        try:
+            with self._lock:
+                conn = self._connection()
+                with conn:
+                    conn.executemany(_UPSERT, params)
+        except sqlite3.Error as e:
+            print(f"Torrent index upsert failed: {e}")
+
+    def search(self, query, limit=50, offset=0, site=None):
+        """Full-text search on names, best seeded first."""
+        expression = _match_expression(query)
+        if not self.path or not expression:
+            return []
+        sql = (
+            "SELECT t.* FROM torrents_fts f JOIN torrents t ON t.rowid = f.rowid "
+            "WHERE torrents_fts MATCH ?"
+        )
+        params = [expression]
+        if site:
+            sql += " AND t.site = ?"
+            params.append(site)
+        sql += " ORDER BY t.seeders DESC LIMIT ? OFFSET ?"
+        params += [limit, offset]
+        try:
+            with self._lock:
+                rows = self._connection().execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            print(f"Torrent index search failed: {e}")
+            return []
+        releases = parse_release_names(row["name"] for row in rows)
+        return [{**row, "release": releases[row["name"]]} for row in map(dict, rows)]
+
+    def by_title_key(self, key, limit=200):
+        """Rows whose parsed release title normalizes to key, best seeded first."""
+        if not self.path or not key:
+            return []
+        try:
+            with self._lock:
+                rows = self._connection().execute(
+                    "SELECT * FROM torrents WHERE title_key = ? ORDER BY seeders DESC LIMIT ?",
+                    (key, limit),
+                ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Torrent index lookup failed: {e}")
+            return []
+        releases = parse_release_names(row["name"] for row in rows)
+        return [{**row, "release": releases[row["name"]]} for row in map(dict, rows)]
+
+    def count(self):
+        if not self.path:
+            return 0
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM torrents").fetchone()[0]
+
+
+torrent_index = TorrentIndex(INDEX_PATH)
@@ -0,0 +1,225 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+import traceback
+from collections import Counter
+
+from helper.scrape import search_site
+from helper.top100_snapshots import snapshots
+
+
+def _env_list(name, default):
+    return [item.strip() for item in os.environ.get(name, default).split(",") if item.strip()]
+
+
+# Warm-up runs at startup unless disabled; off by default under Lambda where every
+# cold start would pay for it
+WARMUP_ENABLED = os.environ.get(
+    "WARMUP_ENABLED", "0" if os.environ.get("AWS_LAMBDA_FUNCTION_NAME") else "1"
+).lower() in ("1", "true", "yes")
+# Top100 categories to snapshot first ("all" for every category)
+WARMUP_CATEGORIES = _env_list("WARMUP_CATEGORIES", "hd_movies,movies,tv_shows,hd_tv_shows,music,games")
+# Extra "site:query" or "query" (piratebay) searches warmed on every start
+WARMUP_QUERIES = _env_list("WARMUP_QUERIES", "")
+# Most popular recorded queries warmed
+WARMUP_POPULAR = int(os.environ.get("WARMUP_POPULAR", 20))
+# Searches warmed at once, and the minimum gap in seconds between two of them starting
+WARMUP_CONCURRENCY = int(os.environ.get("WARMUP_CONCURRENCY", 2))
+WARMUP_GAP = float(os.environ.get("WARMUP_GAP", 1.0))
+
+# Popular query counts survive restarts in the temp dir; empty disables persistence
+POPULAR_QUERIES_PATH = os.environ.get(
+    "POPULAR_QUERIES_PATH", os.path.join(tempfile.gettempdir(), "woztorrentz_popular.json")
+)
+# Distinct queries tracked; the least counted are forgotten past this
+POPULAR_MAX_QUERIES = 1000
+# Recorded searches between two saves
+POPULAR_SAVE_EVERY = 50
+
+
+class PopularQueries:
+    """Counts of page 1 live searches by (site, query, limit), persisted as JSON."""
+
+    def __init__(self, path=POPULAR_QUERIES_PATH):
+        self.path = path
+        self._counts = Counter()
+        self._unsaved = 0
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)
+            for site, query, limit, count in entries:
+                self._counts[(site, query, int(limit))] = int(count)
+        except (OSError, ValueError, TypeError) as e:
+            print(f"Ignoring popular queries file {self.path}: {e}")
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            entries = [[*key, count] for key, count in self._counts.most_common()]
+            self._unsaved = 0
+        try:
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(entries, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"Could not save popular queries to {self.path}: {e}")
+
+    def record(self, site, query, limit):
+        query = " ".join(query.lower().split())
+        if not query:
+            return
+        with self._lock:
+            self._counts[(site, query, limit)] += 1
+            if len(self._counts) > POPULAR_MAX_QUERIES:
+                for key, _ in self._counts.most_common()[POPULAR_MAX_QUERIES // 2:]:
+                    del self._counts[key]
+            self._unsaved += 1
+            save = self._unsaved >= POPULAR_SAVE_EVERY
+        if save:
+            self.save()
+
+    def top(self, n):
+        with self._lock:
+            return [key for key, _ in self._counts.most_common(n)]
+
+
+class WarmUp:
+    """
+    Startup stage that fills the caches before the first users arrive: sites config,
+    configured top100 category snapshots, then configured and popular searches.
+    Progress is reported on /health.
+    """
+
+    def __init__(self):
+        self._steps = []
+        self._plan_cache = []
+        self._task = None
+        self._next_start = 0.0
+        self.state = "idle" if WARMUP_ENABLED else "disabled"
+        self.done = 0
+        self.failed = 0
+        self.started = None
+        self.finished = None
+
+    def add(self, kind, name, step):
+        """Queue a callable (sync or async) run before the default steps, once per (kind, name)."""
+        if any(k == kind and n == name for k, n, _ in self._steps):
+            return
+        self._steps.append((kind, name, step))
+
+    def _plan(self):
+        steps = list(self._steps)
+        categories = snapshots.categories()
+        wanted = categories if WARMUP_CATEGORIES == ["all"] else WARMUP_CATEGORIES
+        for category in dict.fromkeys(wanted):
+            # Snapshots preloaded by a preforked master (serve.py) are already fresh
+            if category in categories and not snapshots.fresh(category):
+                steps.append(("top100", category, lambda c=category: snapshots.refresh(c)))
+
+        searches = []
+        for entry in WARMUP_QUERIES:
+            site, _, query = entry.rpartition(":")
+            searches.append((site or "piratebay", query.lower(), 50))
+        searches.extend(popular_queries.top(WARMUP_POPULAR))
+        for site, query, limit in dict.fromkeys(searches):
+            steps.append((
+                "search", f"{site}:{query}",
+                lambda s=site, q=query, l=limit: search_site(s, q, 1, l),
+            ))
+        return steps
+
+    def progress(self):
+        return {
+            "state": self.state,
+            "total": len(self._plan_cache),
+            "done": self.done,
+            "failed": self.failed,
+            "elapsed": round((self.finished or time.time()) - self.started, 1) if self.started else 0,
+        }
+
+    async def _step(self, name, step):
+        try:
+            result = step()
+            if asyncio.iscoroutine(result):
+                result = await result
+            if result is None:
+                self.failed += 1
+            else:
+                self.done += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            print(f"Warm-up step {name} failed")
+            traceback.print_exc()
+            self.failed += 1
+
+    async def _pace(self):
+        now = time.monotonic()
+        start = max(now, self._next_start)
+        self._next_start = start + WARMUP_GAP
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    async def _run(self):
+        self.state = "running"
+        self.started = time.time()
+        # Snapshots share the refresher's throttle, so categories go one after another
+        # while searches run concurrently, paced by WARMUP_GAP and the host limits
+        searches = asyncio.Semaphore(WARMUP_CONCURRENCY)
+
+        async def search(name, step):
+            async with searches:
+                await self._pace()
+                await self._step(name, step)
+
+        async def in_order(steps):
+            for name, step in steps:
+                await self._step(name, step)
+
+        pending = [asyncio.create_task(in_order(
+            [(name, step) for kind, name, step in self._plan_cache if kind != "search"]
+        ))]
+        pending.extend(
+            asyncio.create_task(search(name, step))
+            for kind, name, step in self._plan_cache if kind == "search"
+        )
+        try:
+            await asyncio.gather(*pending)
+        except asyncio.CancelledError:
+            for task in pending:
+                task.cancel()
+            raise
+        self.state = "done"
+        self.finished = time.time()
+        print(f"Warm-up finished: {self.done} warmed, {self.failed} failed in {self.finished - self.started:.1f}s")
+
+    def start(self):
+        if not WARMUP_ENABLED or self._task is not None:
+            return
+        self._plan_cache = self._plan()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        popular_queries.save()
+
+
+popular_queries = PopularQueries()
+warmup = WarmUp()
@@ -1,30 +1,60 @@
 from fastapi import FastAPI, Request, Depends, status
-from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-import uvicorn
 import traceback
 from mangum import Mangum
 from math import ceil
+from contextlib import asynccontextmanager
 import time
 import os
 
 from routers.v1 import search_router
 from routers.v1 import catergory_router as category_router
 from routers.v1.combo_routers import router as combo_router
-from routers.v1.sites_list_router import router as site_list_router
+from routers.v1.sites_list_router import router as site_list_router, prerender as prerender_sites
 from routers.home_router import router as home_router
 from routers.v1.search_url_router import router as search_url_router
 from routers.v1.top100_router import router as top100_router
+from routers.v1.trending_router import router as trending_router
+from routers.v1.recent_router import router as recent_router
+from routers.v1.match_router import router as match_router
+from routers.v1.usage_router import router as usage_router
+from routers.v1.jobs_router import router as jobs_router
 from helper.uptime import getUptime
-from helper.dependencies import authenticate_request
+from helper.admission import OverloadedError, admission
+from helper.dependencies import authenticate_or_anonymous, authenticate_request, identify_request
+from helper.http_cache import PrivateCacheMiddleware
+from helper.quotas import quotas
+from helper.top100_snapshots import snapshots
+from helper.prefetch import prefetcher
+from helper.warmup import warmup
+from helper.jobs import scheduler as job_scheduler
+from helper.serialization import APIResponse, WireFormatMiddleware
+from helper.compression import CompressionMiddleware
 
 startTime = time.time()
 
+# Registered at import: Mangum runs the lifespan on every invocation
+warmup.add("sites", "config", prerender_sites)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warmup.start()
+    snapshots.start()
+    yield
+    await warmup.stop()
+    await prefetcher.stop()
+    await job_scheduler.stop()
+    await snapshots.stop()
+
+
 app = FastAPI(
     title="Torrent-Api-Py",
     version="1.0.1",
     description="Unofficial Torrent-Api",
     docs_url="/docs",
+    lifespan=lifespan,
+    default_response_class=APIResponse,
     contact={
         "name": "Neeraj Kumar",
         "url": "https://github.com/ryuk-me",
@@ -49,11 +79,27 @@ app.add_middleware(
     allow_headers=["*"],
     expose_headers=["*"],
 )
+app.add_middleware(WireFormatMiddleware)
+app.add_middleware(CompressionMiddleware)
+if quotas:
+    # Responses of key-protected routes must not be shared between callers
+    app.add_middleware(PrivateCacheMiddleware, prefixes=[
+        "/api/v1/search", "/api/v1/top100", "/api/v1/category", "/api/v1/all",
+        "/api/v1/jobs", "/api/v1/usage",
+    ])
+
+@app.exception_handler(OverloadedError)
+async def overloaded_exception_handler(request: Request, exc: OverloadedError):
+    return APIResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"error": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
 @app.exception_handler(Exception)
 async def validation_exception_handler(request: Request, exc: Exception):
     traceback.print_exc()
-    return JSONResponse(
+    return APIResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         content={"message": f"An unexpected error occurred. {exc}"},
     )
@@ -68,12 +114,15 @@ async def health_route(req: Request):
     Health Route : Returns App details.
 
     """
-    return JSONResponse(
+    return APIResponse(
         {
             "app": "Torrent-Api-Py",
             "version": "v" + "1.0.1",
             "ip": req.client.host,
             "uptime": ceil(getUptime(startTime)),
+            "warmup": warmup.progress(),
+            "admission": admission.stats(),
+            "jobs": job_scheduler.stats(),
         }
     )
 
@@ -83,19 +132,27 @@ async def test_cors():
     """
     Test endpoint to verify CORS configuration.
     """
-    return JSONResponse({"message": "CORS is working!"})
+    return APIResponse({"message": "CORS is working!"})
 
 
-app.include_router(search_router.router, prefix="/api/v1/search")
+app.include_router(search_router.router, prefix="/api/v1/search", dependencies=[Depends(authenticate_or_anonymous)])
 app.include_router(category_router.router, prefix="/api/v1/category", dependencies=[Depends(authenticate_request)])
 app.include_router(combo_router, prefix="/api/v1/all", dependencies=[Depends(authenticate_request)])
 app.include_router(site_list_router, prefix="/api/v1/sites")
 app.include_router(search_url_router, prefix="/api/v1/search_url", dependencies=[Depends(authenticate_request)])
-app.include_router(top100_router, prefix="/api/v1/top100")
+app.include_router(top100_router, prefix="/api/v1/top100", dependencies=[Depends(authenticate_or_anonymous)])
+app.include_router(trending_router, prefix="/api/v1/trending")
+app.include_router(recent_router, prefix="/api/v1/recent")
+app.include_router(match_router, prefix="/api/v1/match")
+app.include_router(jobs_router, prefix="/api/v1/jobs", dependencies=[Depends(authenticate_request)])
+# Reporting usage spends no tokens
+app.include_router(usage_router, prefix="/api/v1/usage", dependencies=[Depends(identify_request)])
 app.include_router(home_router, prefix="")
 
 handler = Mangum(app)
 
 if __name__ == "__main__":
+    import uvicorn
+
     port = int(os.environ.get("PORT", 8011))
     uvicorn.run("main:app", host="0.0.0.0", port=port, reload=False)
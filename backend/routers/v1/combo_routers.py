@@ -3,44 +3,118 @@ from typing import Optional
 from helper.is_site_available import check_if_site_available
 import time
 import asyncio
+from fastapi.concurrency import run_in_threadpool
+from helper.admission import OverloadedError
+from helper.cursors import InvalidCursor, paginate, resume
+from helper.deep_search import DEEP_SEARCH_MAX_DEPTH, search_pages
+from helper.dependencies import charge_cost
 from helper.error_messages import error_handler
+from helper.release_parser import filter_by_release
+from helper.scrape import search_site
+from helper.merge import merge_by_infohash, top_k_merge, AGGREGATES
 
 
 router = APIRouter(tags=["Combo Routes"])
 
 
 @router.get("/search")
-async def get_search_combo(query: str, limit: Optional[int] = 0):
+async def get_search_combo(
+    query: str,
+    limit: Optional[int] = 0,
+    aggregate: str = "max",
+    resolution: Optional[str] = None,
+    page_size: Optional[int] = None,
+    cursor: Optional[str] = None,
+    depth: int = 1,
+):
+    """
+    Search every site and merge rows describing the same torrent by infohash.
+    `aggregate` (max, min or sum) combines the seeders/leechers reported by each site,
+    `resolution` (e.g. 1080p) filters on the parsed release metadata.
+
+    With `page_size` the merged results are paginated: the response carries a
+    `next_cursor` to pass back as `cursor`, and following pages are served from the
+    cached merged result set, scraping a site's next page only when it runs out.
+
+    With `depth` > 1 the first `depth` upstream pages of every site are fetched
+    concurrently (stopping at each site's last page) and merged in one response.
+    """
     start_time = time.time()
     query = query.lower()
+    if aggregate not in AGGREGATES:
+        return error_handler(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            message={"error": f"aggregate must be one of {', '.join(AGGREGATES)}"},
+        )
+    if not 1 <= depth <= DEEP_SEARCH_MAX_DEPTH:
+        return error_handler(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            message={"error": f"depth must be between 1 and {DEEP_SEARCH_MAX_DEPTH}"},
+        )
     all_sites = check_if_site_available("piratebay")
     sites_list = list(all_sites.keys())
+    charge_cost(depth * len(sites_list))
+
+    if cursor or page_size:
+        try:
+            if cursor:
+                page = await resume(cursor)
+            else:
+                sites = [(site, all_sites[site]["limit"]) for site in sites_list]
+                page = await paginate(query, sites, page_size, 0, aggregate, resolution)
+        except InvalidCursor as e:
+            return error_handler(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                message={"error": str(e)},
+            )
+        if not page["data"] and not cursor:
+            return error_handler(
+                status_code=status.HTTP_404_NOT_FOUND,
+                message={"error": "Result not found."},
+            )
+        page["total"] = len(page["data"])
+        page["time"] = time.time() - start_time
+        return page
+
     tasks = []
     COMBO = {"data": []}
-    total_torrents_overall = 0
     for site in sites_list:
-        limit = (
+        site_limit = (
             all_sites[site]["limit"]
             if limit == 0 or limit > all_sites[site]["limit"]
             else limit
         )
-        tasks.append(
-            asyncio.create_task(
-                all_sites[site]["website"]().search(query, page=1, limit=limit)
-            )
-        )
-    results = await asyncio.gather(*tasks)
-    for res in results:
-        if res is not None and len(res["data"]) > 0:
-            for torrent in res["data"]:
-                COMBO["data"].append(torrent)
-            total_torrents_overall = total_torrents_overall + res["total"]
+        if depth > 1:
+            tasks.append(search_pages(site, query, depth, site_limit))
+        else:
+            tasks.append(search_site(site, query, page=1, limit=site_limit))
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    # Partial results are fine, but when every site was shed the client should back off
+    if results and all(isinstance(res, OverloadedError) for res in results):
+        raise results[0]
+    streams = []
+    for site, res in zip(sites_list, results):
+        if isinstance(res, Exception) or res is None or not res.get("data"):
+            continue
+        streams.append([{**torrent, "site": site} for torrent in res["data"]])
+    # Each site's rows are already ranked by seeders; the heap merge keeps that order
+    # and merging by infohash keeps the first (best seeded) row of every torrent first.
+    # With max and no release filter the best `limit` torrents are all among the first
+    # limit * sites merged rows (a torrent appears once per site), so the merge stops
+    # there; sum/min need every copy of a torrent and merge everything.
+    merge_limit = limit * len(streams) if limit and aggregate == "max" and not resolution else None
+    COMBO["data"] = merge_by_infohash(top_k_merge(streams, merge_limit), aggregate)
+    if aggregate != "max":
+        COMBO["data"].sort(key=lambda x: x.get("seeders", 0), reverse=True)
+    COMBO["data"] = filter_by_release(COMBO["data"], resolution=resolution)
+    if limit:
+        COMBO["data"] = COMBO["data"][:limit]
     COMBO["time"] = time.time() - start_time
-    COMBO["total"] = total_torrents_overall
-    if total_torrents_overall == 0:
+    COMBO["total"] = len(COMBO["data"])
+    if COMBO["total"] == 0:
         return error_handler(
             status_code=status.HTTP_404_NOT_FOUND,
-            json_message={"error": "Result not found."},
+            message={"error": "Result not found."},
         )
     return COMBO
 
@@ -66,7 +140,8 @@ async def get_all_trending(limit: Optional[int] = 0):
         )
         tasks.append(
             asyncio.create_task(
-                all_sites[site]["website"]().trending(
+                run_in_threadpool(
+                    all_sites[site]["website"]().trending,
                     category=None, page=1, limit=limit
                 )
             )
@@ -82,7 +157,7 @@ async def get_all_trending(limit: Optional[int] = 0):
     if total_torrents_overall == 0:
         return error_handler(
             status_code=status.HTTP_404_NOT_FOUND,
-            json_message={"error": "Result not found."},
+            message={"error": "Result not found."},
         )
     return COMBO
 
@@ -108,7 +183,10 @@ async def get_all_recent(limit: Optional[int] = 0):
         )
         tasks.append(
             asyncio.create_task(
-                all_sites[site]["website"]().recent(category=None, page=1, limit=limit)
+                run_in_threadpool(
+                    all_sites[site]["website"]().recent,
+                    category=None, page=1, limit=limit
+                )
             )
         )
     results = await asyncio.gather(*tasks)
@@ -122,6 +200,6 @@ async def get_all_recent(limit: Optional[int] = 0):
     if total_torrents_overall == 0:
         return error_handler(
             status_code=status.HTTP_404_NOT_FOUND,
-            json_message={"error": "Result not found."},
+            message={"error": "Result not found."},
         )
     return COMBO
@@ -0,0 +1,98 @@
+from typing import List, Optional
+from fastapi import APIRouter, Query, status
+from pydantic import BaseModel
+from helper.dependencies import charge_cost
+from helper.error_messages import error_handler
+from helper.is_site_available import check_if_site_available
+from helper.jobs import JOB_MAX_PAGES, JOBS_ENABLED, Job, scheduler
+from helper.merge import AGGREGATES
+
+router = APIRouter(tags=["Jobs"])
+
+
+class JobRequest(BaseModel):
+    query: str
+    sites: Optional[List[str]] = None
+    pages: int = 5
+    limit: int = 0
+    aggregate: str = "max"
+    resolution: Optional[str] = None
+
+
+def _not_found(job_id):
+    return error_handler(
+        status_code=status.HTTP_404_NOT_FOUND,
+        message={"error": f"Job '{job_id}' not found or expired."},
+    )
+
+
+@router.post("")
+async def create_job(body: JobRequest):
+    """
+    Start a deep search across `pages` upstream pages of every site (or `sites`).
+
+    Returns 202 with the job id at once; poll GET /jobs/{id} for progress and the
+    merged results found so far until `status` is done, failed or cancelled.
+    Not available on serverless deployments, where work cannot outlive the request.
+    """
+    if not JOBS_ENABLED:
+        return error_handler(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            message={"error": "Jobs are not available on serverless deployments."},
+        )
+    query = " ".join(body.query.split())
+    if not query:
+        return error_handler(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            message={"error": "Query is required"},
+        )
+    if not 1 <= body.pages <= JOB_MAX_PAGES:
+        return error_handler(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            message={"error": f"pages must be between 1 and {JOB_MAX_PAGES}"},
+        )
+    if body.aggregate not in AGGREGATES:
+        return error_handler(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            message={"error": f"aggregate must be one of {', '.join(AGGREGATES)}"},
+        )
+    all_sites = check_if_site_available("piratebay")
+    requested = [site.lower() for site in body.sites] if body.sites else list(all_sites)
+    unknown = [site for site in requested if site not in all_sites]
+    if unknown:
+        return error_handler(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            message={"error": f"{', '.join(unknown)} not supported"},
+        )
+    sites = [
+        (site, all_sites[site]["limit"] if body.limit <= 0 else min(body.limit, all_sites[site]["limit"]))
+        for site in dict.fromkeys(requested)
+    ]
+    charge_cost(body.pages * len(sites))
+
+    job = scheduler.submit(Job(query, sites, body.pages, body.aggregate, body.resolution))
+    return error_handler(
+        status_code=status.HTTP_202_ACCEPTED,
+        message={"id": job.id, "status": job.status, "url": f"/api/v1/jobs/{job.id}"},
+    )
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str, offset: int = Query(0, ge=0), limit: Optional[int] = Query(None, ge=1)):
+    """Status, progress, per-site errors and the merged results so far (paged by offset/limit)."""
+    job = scheduler.get(job_id, offset, limit)
+    if job is None:
+        return _not_found(job_id)
+    return error_handler(status_code=status.HTTP_200_OK, message=job)
+
+
+@router.delete("/{job_id}")
+async def cancel_job(job_id: str):
+    """
+    Cancel a queued or running job; results found so far stay readable.
+    A job running in another worker is reported as cancelling until that worker stops it.
+    """
+    job_status = scheduler.cancel(job_id)
+    if job_status is None:
+        return _not_found(job_id)
+    return error_handler(status_code=status.HTTP_200_OK, message={"id": job_id, "status": job_status})
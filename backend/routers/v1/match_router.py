@@ -0,0 +1,59 @@
+import time
+from typing import List, Optional
+from fastapi import APIRouter, status
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from helper.error_messages import error_handler
+from helper.title_match import match_title
+
+router = APIRouter(tags=["Match Titles"])
+
+# Most titles accepted by one request
+MATCH_MAX_TITLES = 100
+
+
+class MatchTitle(BaseModel):
+    title: str
+    year: Optional[int] = None
+    imdb_id: Optional[str] = None
+
+
+class MatchRequest(BaseModel):
+    titles: List[MatchTitle]
+
+
+@router.post("")
+async def match_titles(body: MatchRequest):
+    """
+    Match movie (title, year) tuples against the local torrent index.
+    Returns the best torrent per quality tier (2160p, 1080p, 720p, sd) for every title.
+    """
+    if not body.titles or len(body.titles) > MATCH_MAX_TITLES:
+        return error_handler(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            message={"error": f"Between 1 and {MATCH_MAX_TITLES} titles are required"},
+        )
+
+    start_time = time.time()
+
+    def run():
+        return [
+            {
+                "title": item.title,
+                "year": item.year,
+                "imdb_id": item.imdb_id,
+                "matches": match_title(item.title, item.year),
+            }
+            for item in body.titles
+        ]
+
+    results = await run_in_threadpool(run)
+    return error_handler(
+        status_code=status.HTTP_200_OK,
+        message={
+            "results": results,
+            "matched": sum(1 for r in results if r["matches"]),
+            "total": len(results),
+            "time": time.time() - start_time,
+        },
+    )
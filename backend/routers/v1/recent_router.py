@@ -1,6 +1,7 @@
 from fastapi import APIRouter
 from fastapi import status
 from typing import Optional
+from fastapi.concurrency import run_in_threadpool
 from helper.is_site_available import check_if_site_available
 from helper.error_messages import error_handler
 
@@ -24,31 +25,36 @@ async def get_recent(
             else limit
         )
         if all_sites[site]["recent_available"]:
+            available_categories = all_sites[site].get(
+                "top_100_categories", all_sites[site]["categories"]
+            )
             if (
                 category is not None
                 and not all_sites[site]["recent_category_available"]
             ):
                 return error_handler(
                     status_code=status.HTTP_404_NOT_FOUND,
-                    json_message={
+                    message={
                         "error": "Search by Recent category not available for {}.".format(
                             site
                         )
                     },
                 )
-            if category is not None and category not in all_sites[site]["categories"]:
+            if category is not None and category not in available_categories:
                 return error_handler(
                     status_code=status.HTTP_404_NOT_FOUND,
-                    json_message={
+                    message={
                         "error": "Selected category not available.",
-                        "available_categories": all_sites[site]["categories"],
+                        "available_categories": list(available_categories),
                     },
                 )
-            resp = await all_sites[site]["website"]().recent(category, page, limit)
+            resp = await run_in_threadpool(
+                all_sites[site]["website"]().recent, category, page, limit
+            )
             if resp is None:
                 return error_handler(
                     status_code=status.HTTP_403_FORBIDDEN,
-                    json_message={
+                    message={
                         "error": "Website Blocked Change IP or Website Domain."
                     },
                 )
@@ -58,16 +64,16 @@ async def get_recent(
             else:
                 return error_handler(
                     status_code=status.HTTP_404_NOT_FOUND,
-                    json_message={"error": "Result not found."},
+                    message={"error": "Result not found."},
                 )
         else:
             return error_handler(
                 status_code=status.HTTP_404_NOT_FOUND,
-                json_message={
+                message={
                     "error": "Recent search not availabe for {}.".format(site)
                 },
             )
     return error_handler(
         status_code=status.HTTP_404_NOT_FOUND,
-        json_message={"error": "Selected Site Not Available"},
+        message={"error": "Selected Site Not Available"},
     )
@@ -3,20 +3,63 @@ import json
 import sys
 import traceback
 import asyncio
+import time
+from typing import List, Optional
 from fastapi import APIRouter, status, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
 from fastapi.concurrency import run_in_threadpool
+from helper.admission import OverloadedError
+from helper.cursors import InvalidCursor, paginate, resume
+from helper.deep_search import DEEP_SEARCH_MAX_DEPTH, search_pages
+from helper.dependencies import charge_cost
 from helper.error_messages import error_handler
 from helper.is_site_available import check_if_site_available
+from helper.release_parser import filter_by_release
+from helper.scrape import prefetch_search, search_site
+from helper.torrent_index import torrent_index
+from helper.warmup import popular_queries
 
 router = APIRouter(tags=["Search Torrents"])
 
+# Most queries accepted by one /batch request, and how many of them run at once
+BATCH_MAX_QUERIES = 50
+BATCH_CONCURRENCY = 8
+
+
+class BatchSearchRequest(BaseModel):
+    queries: List[str]
+    site: str = "piratebay"
+    limit: int = 10
+    page: int = 1
+    stream: bool = False
+
 
 @router.get("")
 async def search_torrents(
-    request: Request, query: str, site: str, limit: int = 50, page: int = 1
+    request: Request,
+    query: str,
+    site: str,
+    limit: int = 50,
+    page: int = 1,
+    source: str = "live",
+    resolution: Optional[str] = None,
+    page_size: Optional[int] = None,
+    cursor: Optional[str] = None,
+    depth: int = 1,
 ):
     """
     Get Links for torrent search.
+
+    source=live scrapes the site, source=local answers from the local torrent index
+    and source=hybrid merges both by infohash. resolution (e.g. 1080p) filters rows
+    on their parsed release metadata.
+
+    With page_size (live only) results are paginated with opaque cursors instead of
+    upstream page numbers: pass `next_cursor` back as `cursor` for the next page.
+
+    With depth > 1 upstream pages page..page+depth-1 are fetched concurrently, stopping
+    at the site's last page, and returned deduped and ranked in one response.
     """
     if not query:
         return error_handler(
@@ -32,39 +75,185 @@ async def search_torrents(
             message={"error": f"{site} not supported"},
         )
 
+    source = source.lower()
+    if source not in ("live", "local", "hybrid"):
+        return error_handler(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            message={"error": "source must be one of live, local, hybrid"},
+        )
+
+    if not 1 <= depth <= DEEP_SEARCH_MAX_DEPTH:
+        return error_handler(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            message={"error": f"depth must be between 1 and {DEEP_SEARCH_MAX_DEPTH}"},
+        )
+    if source != "local":
+        charge_cost(depth)
+
+    if (cursor or page_size) and source == "live":
+        start_time = time.time()
+        try:
+            if cursor:
+                result = await resume(cursor)
+            else:
+                result = await paginate(
+                    query, [(site, all_sites[site]["limit"])], page_size,
+                    resolution=resolution,
+                )
+        except InvalidCursor as e:
+            return error_handler(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                message={"error": str(e)},
+            )
+        return error_handler(
+            status_code=status.HTTP_200_OK,
+            message={
+                **result,
+                "total": len(result["data"]),
+                "query": query,
+                "site": site,
+                "source": source,
+                "time": time.time() - start_time,
+            },
+        )
+
     try:
         scraper_class = all_sites[site]["website"]
-        scraper_instance = scraper_class()
-        
-        # Check if the search function is asynchronous
-        if asyncio.iscoroutinefunction(scraper_instance.search):
-            # If it's async, await it directly
-            data = await scraper_instance.search(query, page, limit)
+
+        local = []
+        if source != "live":
+            local = await run_in_threadpool(
+                torrent_index.search, query, limit, (page - 1) * limit, scraper_class._name
+            )
+        if source == "local":
+            local = filter_by_release(local, resolution=resolution)
+            return error_handler(
+                status_code=status.HTTP_200_OK,
+                message={
+                    "data": local,
+                    "total": len(local),
+                    "query": query,
+                    "site": site,
+                    "limit": limit,
+                    "page": page,
+                    "source": source,
+                },
+            )
+
+        if depth > 1:
+            data = await search_pages(site, query, depth, limit, start=page)
         else:
-            # If it's synchronous, run it in a thread pool to avoid blocking
-            data = await run_in_threadpool(scraper_instance.search, query, page, limit)
+            data = await search_site(site, query, page, limit)
 
-        if data is None:
+        if data is None and not local:
             return error_handler(
                 status_code=status.HTTP_403_FORBIDDEN,
                 message={"error": "Website Blocked. Change IP or Website Domain."},
             )
         else:
+            rows = data.get("data", []) if data else []
+            if data and data.get("data"):
+                if depth == 1:
+                    prefetch_search(site, query, page, limit)
+                if page == 1:
+                    popular_queries.record(site, query, limit)
+            if local:
+                # Live rows win over indexed copies of the same torrent
+                live_hashes = {(row.get("hash") or "").lower() for row in rows}
+                rows = rows + [row for row in local if row["hash"] not in live_hashes]
+                rows.sort(key=lambda x: x.get("seeders", 0), reverse=True)
+                rows = rows[:limit]
+            if resolution:
+                rows = filter_by_release(rows, resolution=resolution)
             return error_handler(
                 status_code=status.HTTP_200_OK,
                 message={
-                    "data": data.get("data", []),
-                    "total": data.get("total", 0),
+                    "data": rows,
+                    "total": len(rows) if local or resolution else data.get("total", 0),
                     "query": query,
                     "site": site,
                     "limit": limit,
                     "page": page,
+                    "source": source,
+                    **({"depth": depth, "pages": data["pages"] if data else 0} if depth > 1 else {}),
+                    **({"stale": True} if data and data.get("stale") else {}),
                 },
             )
 
+    except OverloadedError:
+        raise
     except Exception as e:
         traceback.print_exc()
         return error_handler(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             message={"error": f"An unexpected error occurred: {str(e)}"},
         )
+
+
+@router.post("/batch")
+async def batch_search_torrents(body: BatchSearchRequest):
+    """
+    Search many titles in one request.
+
+    Queries run concurrently under the shared per-host rate limits and result cache.
+    With stream=true results are sent as newline-delimited JSON as each query finishes.
+    """
+    site = body.site.lower()
+    all_sites = check_if_site_available(site)
+    if not all_sites:
+        return error_handler(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            message={"error": f"{site} not supported"},
+        )
+    queries = list(dict.fromkeys(q.strip() for q in body.queries if q.strip()))
+    if not queries or len(queries) > BATCH_MAX_QUERIES:
+        return error_handler(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            message={"error": f"Between 1 and {BATCH_MAX_QUERIES} queries are required"},
+        )
+    charge_cost(len(queries))
+
+    start_time = time.time()
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def run(query):
+        async with semaphore:
+            try:
+                data = await search_site(site, query, body.page, body.limit)
+            except OverloadedError as e:
+                return {"query": query, "data": [], "total": 0, "error": str(e), "retry_after": e.retry_after}
+            except Exception as e:
+                traceback.print_exc()
+                return {"query": query, "data": [], "total": 0, "error": str(e)}
+        if data is None:
+            return {
+                "query": query,
+                "data": [],
+                "total": 0,
+                "error": "Website Blocked. Change IP or Website Domain.",
+            }
+        return {
+            "query": query,
+            "data": data.get("data", []),
+            "total": data.get("total", 0),
+            "error": None,
+        }
+
+    if body.stream:
+        async def lines():
+            for result in asyncio.as_completed([run(q) for q in queries]):
+                yield json.dumps(await result) + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    results = await asyncio.gather(*(run(q) for q in queries))
+    return error_handler(
+        status_code=status.HTTP_200_OK,
+        message={
+            "results": results,
+            "site": site,
+            "limit": body.limit,
+            "page": body.page,
+            "time": time.time() - start_time,
+        },
+    )
@@ -1,24 +1,36 @@
-from fastapi import APIRouter, status
+from fastapi import APIRouter, Request
+from helper.compression import cached_response
+from helper.http_cache import STATIC_CACHE_CONTROL
 from helper.is_site_available import check_if_site_available, sites_config
-from helper.error_messages import error_handler
 
 router = APIRouter(tags=["Get all sites"])
 
+# Site configuration only changes on deploy: render each body once and
+# revalidate with a content hash ETag
+_bodies = {}
+
 
 @router.get("")
-async def get_all_supported_sites():
+async def get_all_supported_sites(request: Request):
     all_sites = check_if_site_available("piratebay")
     sites_list = [site for site in all_sites.keys() if all_sites[site]["website"]]
-    return error_handler(
-        status_code=status.HTTP_200_OK,
-        json_message={
-            "supported_sites": sites_list,
-        },
-    )
-    
+    return cached_response(request, _bodies, "sites", lambda: {
+        "supported_sites": sites_list,
+    }, cache_control=STATIC_CACHE_CONTROL)
+
+
 @router.get("/config")
-async def get_site_config():
-    return error_handler(
-        status_code=status.HTTP_200_OK,
-        json_message=sites_config
-    )
+async def get_site_config(request: Request):
+    return cached_response(request, _bodies, "config", lambda: {
+        site: {**config, "website": config["website"]._name}
+        for site, config in sites_config.items()
+    }, cache_control=STATIC_CACHE_CONTROL)
+
+
+async def prerender():
+    """Render and compress both bodies ahead of the first request (startup warm-up)."""
+    for accept_encoding in (b"", b"gzip", b"br"):
+        request = Request({"type": "http", "headers": [(b"accept-encoding", accept_encoding)]})
+        await get_all_supported_sites(request)
+        await get_site_config(request)
+    return True
@@ -1,22 +1,107 @@
-from fastapi import APIRouter, status, Query
+import asyncio
+import time
+from fastapi import APIRouter, status, Query, Request
 from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from typing import Optional
+from helper.admission import OverloadedError, admission
+from helper.compression import cached_response, with_validators
 from helper.error_messages import error_handler
-from helper.is_site_available import check_if_site_available
-from torrents.pirate_bay import PirateBay
+from helper.http_cache import (
+    LIVE_CACHE_CONTROL, STATIC_CACHE_CONTROL, TOP100_CACHE_CONTROL, content_etag,
+)
+from helper.serialization import dumps, wire_format
+from helper.is_site_available import PirateBay, check_if_site_available
+from helper.prefetch import prefetcher
+from helper.quotas import record
+from helper.top100_snapshots import SNAPSHOT_LIMIT, snapshots, diff, sse_frame
 
 router = APIRouter(tags=["Top 100"])
 
+# Rendered bodies of routes whose content only changes on deploy
+_bodies = {}
+
+
+def _prefetch_next(category_id, page, limit):
+    """
+    Warm the browse pages behind the next top100 page after a live fetch. Snapshot hits
+    don't call it: the refresher keeps the pages behind them current.
+    """
+    if not prefetcher.enabled or admission.saturated() or PirateBay().browse_cached(category_id, page + 1, limit):
+        return
+    prefetcher.schedule(
+        ("top100", category_id, page + 1, limit),
+        lambda: PirateBay().top100_category(category_id, page + 1, limit),
+    )
+
+
+async def _live_top100(category_id, page, limit):
+    """
+    Live rows of a top100 page. Served from cached browse pages it costs no upstream
+    request, so it skips admission and counts as a cache hit; otherwise it takes a slot.
+    """
+    pb = PirateBay()
+    if pb.browse_cached(category_id, page, limit):
+        record("cache_hits")
+        return await run_in_threadpool(pb.top100_category, category_id, page, limit)
+    record("scrapes")
+    async with admission.admit():
+        return await run_in_threadpool(pb.top100_category, category_id, page, limit)
+
+
+def _live_response(request, message):
+    """Response for a live (not snapshotted) page; the ETag leaves out the per-request "time"."""
+    etag = content_etag(dumps([{k: v for k, v in message.items() if k != "time"}, wire_format()]))
+    return with_validators(request, error_handler(
+        status_code=status.HTTP_200_OK,
+        message=message,
+    ), LIVE_CACHE_CONTROL, etag=etag)
+
+
+def _snapshotted(page, limit):
+    """True when a page is answered from the snapshot: page 1, up to the rows it holds."""
+    return page == 1 and limit <= SNAPSHOT_LIMIT
+
+
+def _stale_snapshot(category, page, limit):
+    """
+    The last snapshot of a category, whatever its age, when admission sheds a live scrape.
+    Only the snapshotted page is served this way; anything else is shed with the 503.
+    """
+    snapshot = snapshots.latest(category) if _snapshotted(page, limit) else None
+    if snapshot is None:
+        raise OverloadedError()
+    return snapshot
+
 @router.get("/movies")
-async def get_top100_movies(page: int = 1, limit: int = 100):
+async def get_top100_movies(request: Request, page: int = 1, limit: int = 100):
     """
     Get top 100 movies from Pirate Bay based on seeders.
     """
     try:
-        pb = PirateBay()
-        
-        # Run the synchronous top100_movies function in a thread pool
-        data = await run_in_threadpool(pb.top100_movies, page, limit)
+        # Movies browse category 207 is the hd_movies snapshot
+        snapshot = snapshots.get("hd_movies") if _snapshotted(page, limit) else None
+        stale = False
+        if snapshot is not None:
+            record("cache_hits")
+        else:
+            try:
+                data = await _live_top100(207, page, limit)
+                _prefetch_next(207, page, limit)
+            except OverloadedError:
+                snapshot = _stale_snapshot("hd_movies", page, limit)
+                stale = True
+        if snapshot is not None:
+            return cached_response(request, snapshot.bodies, ("movies", limit, stale), lambda: {
+                "data": snapshot.data(limit),
+                "total": min(limit, len(snapshot.rows)),
+                "page": page,
+                "limit": limit,
+                "source": "Pirate Bay",
+                "time": snapshot.time,
+                "updated": snapshot.created,
+                **({"stale": True} if stale else {}),
+            }, version=snapshot.version, cache_control=LIVE_CACHE_CONTROL if stale else TOP100_CACHE_CONTROL)
 
         if data is None:
             return error_handler(
@@ -24,23 +109,22 @@ async def get_top100_movies(page: int = 1, limit: int = 100):
                 message={"error": "Website Blocked. Change IP or Website Domain."},
             )
         elif data.get("data"):
-            return error_handler(
-                status_code=status.HTTP_200_OK,
-                message={
-                    "data": data.get("data", []),
-                    "total": data.get("total", 0),
-                    "page": page,
-                    "limit": limit,
-                    "source": "Pirate Bay",
-                    "time": data.get("time", 0)
-                },
-            )
+            return _live_response(request, {
+                "data": data.get("data", []),
+                "total": data.get("total", 0),
+                "page": page,
+                "limit": limit,
+                "source": "Pirate Bay",
+                "time": data.get("time", 0)
+            })
         else:
             return error_handler(
                 status_code=status.HTTP_404_NOT_FOUND,
                 message={"error": "No top movies found."},
             )
 
+    except OverloadedError:
+        raise
     except Exception as e:
         return error_handler(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -48,7 +132,7 @@ async def get_top100_movies(page: int = 1, limit: int = 100):
         )
 
 @router.get("/categories")
-async def get_top100_categories():
+async def get_top100_categories(request: Request):
     """
     Get available top 100 categories.
     """
@@ -66,13 +150,10 @@ async def get_top100_categories():
             if hd_movies_item:
                 formatted_categories.remove(hd_movies_item)
                 formatted_categories.insert(0, hd_movies_item)
-            return error_handler(
-                status_code=status.HTTP_200_OK,
-                message={
-                    "categories": formatted_categories,
-                    "source": "Pirate Bay"
-                },
-            )
+            return cached_response(request, _bodies, "categories", lambda: {
+                "categories": formatted_categories,
+                "source": "Pirate Bay"
+            }, cache_control=STATIC_CACHE_CONTROL)
         else:
             return error_handler(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -86,6 +167,7 @@ async def get_top100_categories():
 
 @router.get("/category/{category}")
 async def get_top100_by_category(
+    request: Request,
     category: str,
     page: int = Query(1, ge=1),
     limit: int = Query(100, ge=1, le=100)
@@ -111,11 +193,31 @@ async def get_top100_by_category(
                 },
             )
         
-        pb = PirateBay()
         category_id = categories[category]
-        
-        # Run the synchronous top100_category function in a thread pool
-        data = await run_in_threadpool(pb.top100_category, category_id, page, limit)
+        snapshot = snapshots.get(category) if _snapshotted(page, limit) else None
+        stale = False
+        if snapshot is not None:
+            record("cache_hits")
+        else:
+            try:
+                data = await _live_top100(category_id, page, limit)
+                _prefetch_next(category_id, page, limit)
+            except OverloadedError:
+                snapshot = _stale_snapshot(category, page, limit)
+                stale = True
+        if snapshot is not None:
+            return cached_response(request, snapshot.bodies, ("category", limit, stale), lambda: {
+                "data": snapshot.data(limit),
+                "total": min(limit, len(snapshot.rows)),
+                "page": page,
+                "limit": limit,
+                "category": category,
+                "category_id": category_id,
+                "source": "Pirate Bay",
+                "time": snapshot.time,
+                "updated": snapshot.created,
+                **({"stale": True} if stale else {}),
+            }, version=snapshot.version, cache_control=LIVE_CACHE_CONTROL if stale else TOP100_CACHE_CONTROL)
 
         if data is None:
             return error_handler(
@@ -123,27 +225,215 @@ async def get_top100_by_category(
                 message={"error": "Website Blocked. Change IP or Website Domain."},
             )
         elif data.get("data"):
+            return _live_response(request, {
+                "data": data.get("data", []),
+                "total": data.get("total", 0),
+                "page": page,
+                "limit": limit,
+                "category": category,
+                "category_id": category_id,
+                "source": "Pirate Bay",
+                "time": data.get("time", 0)
+            })
+        else:
             return error_handler(
-                status_code=status.HTTP_200_OK,
+                status_code=status.HTTP_404_NOT_FOUND,
+                message={"error": f"No top {category.replace('_', ' ')} found."},
+            )
+
+    except OverloadedError:
+        raise
+    except Exception as e:
+        return error_handler(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            message={"error": f"An unexpected error occurred: {str(e)}"},
+        )
+
+@router.get("/multi")
+async def get_top100_multi(
+    request: Request,
+    categories: str,
+    limit: int = Query(20, ge=1, le=100)
+):
+    """
+    Get top torrents for several categories in one response, e.g. ?categories=hd_movies,tv_shows.
+    Categories are fetched concurrently and share cached browse pages with the other top100 routes.
+    """
+    try:
+        start_time = time.time()
+        all_sites = check_if_site_available("piratebay")
+        available = all_sites["piratebay"].get("top_100_categories", {})
+        requested = list(dict.fromkeys(c.strip() for c in categories.split(",") if c.strip()))
+        unknown = [c for c in requested if c not in available]
+        if not requested or unknown:
+            return error_handler(
+                status_code=status.HTTP_404_NOT_FOUND,
                 message={
-                    "data": data.get("data", []),
-                    "total": data.get("total", 0),
-                    "page": page,
-                    "limit": limit,
-                    "category": category,
-                    "category_id": category_id,
-                    "source": "Pirate Bay",
-                    "time": data.get("time", 0)
+                    "error": f"Categories not available: {', '.join(unknown) or categories}",
+                    "available_categories": list(available.keys())
                 },
             )
-        else:
+
+        async def fetch(category):
+            snapshot = snapshots.get(category)
+            if snapshot is not None:
+                return {"data": snapshot.data(limit), "time": snapshot.time}
+            try:
+                return await _live_top100(available[category], 1, limit)
+            except OverloadedError:
+                snapshot = _stale_snapshot(category, 1, limit)
+                return {"data": snapshot.data(limit), "time": snapshot.time, "stale": True}
+
+        results = await asyncio.gather(*(fetch(c) for c in requested))
+
+        response = {}
+        for category, data in zip(requested, results):
+            rows = data.get("data", []) if data else []
+            response[category] = {
+                "data": rows,
+                "total": len(rows),
+                "category_id": available[category],
+                "error": None if data is not None else "Website Blocked. Change IP or Website Domain.",
+            }
+            if data and data.get("stale"):
+                response[category]["stale"] = True
+
+        # "time" differs on every request, so the ETag hashes only the rows
+        etag = content_etag(dumps([response, limit, wire_format()]))
+        return with_validators(request, error_handler(
+            status_code=status.HTTP_200_OK,
+            message={
+                "categories": response,
+                "limit": limit,
+                "source": "Pirate Bay",
+                "time": time.time() - start_time
+            },
+        ), LIVE_CACHE_CONTROL, etag=etag)
+
+    except OverloadedError:
+        raise
+    except Exception as e:
+        return error_handler(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            message={"error": f"An unexpected error occurred: {str(e)}"},
+        )
+
+@router.get("/category/{category}/diff")
+async def get_top100_diff(request: Request, category: str, since: int = 0):
+    """
+    Get the changes to a category's top 100 since a snapshot version.
+    Falls back to the full snapshot when `since` is unknown or too old.
+    """
+    try:
+        categories = snapshots.categories()
+        if category not in categories:
             return error_handler(
                 status_code=status.HTTP_404_NOT_FOUND,
-                message={"error": f"No top {category.replace('_', ' ')} found."},
+                message={
+                    "error": f"Category '{category}' not available.",
+                    "available_categories": list(categories.keys())
+                },
             )
 
+        snapshot = snapshots.get(category) or snapshots.cached(category)
+        if snapshot is None:
+            try:
+                async with admission.admit():
+                    snapshot = await snapshots.refresh(category, throttle=False)
+            except OverloadedError:
+                snapshot = _stale_snapshot(category, 1, SNAPSHOT_LIMIT)
+        if snapshot is None:
+            return error_handler(
+                status_code=status.HTTP_403_FORBIDDEN,
+                message={"error": "Website Blocked. Change IP or Website Domain."},
+            )
+
+        def build():
+            message = {
+                "category": category,
+                "category_id": snapshot.category_id,
+                "version": snapshot.version,
+                "since": since,
+                "source": "Pirate Bay",
+            }
+            base = snapshots.version(category, since) if since else None
+            if base is None:
+                message["full"] = True
+                message["data"] = snapshot.data()
+                message["total"] = len(snapshot.rows)
+            else:
+                message["full"] = False
+                message.update(diff(base, snapshot))
+            return message
+
+        return cached_response(
+            request, snapshot.bodies, ("diff", since), build,
+            version=snapshot.version, cache_control=TOP100_CACHE_CONTROL,
+        )
+
+    except OverloadedError:
+        raise
     except Exception as e:
         return error_handler(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             message={"error": f"An unexpected error occurred: {str(e)}"},
         )
+
+@router.get("/category/{category}/stream")
+async def stream_top100(request: Request, category: str, since: int = 0):
+    """
+    Server-sent event stream of a category's top 100 deltas, pushed on every snapshot refresh.
+    Starts with a `snapshot` event (or a `delta` from `since` / Last-Event-ID when still in history).
+    """
+    categories = snapshots.categories()
+    if category not in categories:
+        return error_handler(
+            status_code=status.HTTP_404_NOT_FOUND,
+            message={
+                "error": f"Category '{category}' not available.",
+                "available_categories": list(categories.keys())
+            },
+        )
+
+    last_event_id = request.headers.get("last-event-id", "")
+    if last_event_id.isdigit():
+        since = int(last_event_id)
+
+    queue = snapshots.subscribe(category)
+
+    async def events():
+        try:
+            snapshot = snapshots.get(category)
+            if snapshot is not None and snapshot.version != since:
+                base = snapshots.version(category, since) if since else None
+                if base is None:
+                    yield sse_frame("snapshot", snapshot.version, {
+                        "category": category,
+                        "version": snapshot.version,
+                        "data": snapshot.data(),
+                    })
+                else:
+                    yield sse_frame("delta", snapshot.version, {
+                        "category": category,
+                        "version": snapshot.version,
+                        "since": since,
+                        **diff(base, snapshot),
+                    })
+            while True:
+                try:
+                    frame = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield b": ping\n\n"
+                    continue
+                if frame is None:
+                    break
+                yield frame
+        finally:
+            snapshots.unsubscribe(category, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
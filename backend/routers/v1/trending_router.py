@@ -1,6 +1,7 @@
 from fastapi import APIRouter
 from fastapi import status
 from typing import Optional
+from fastapi.concurrency import run_in_threadpool
 from helper.is_site_available import check_if_site_available
 from helper.error_messages import error_handler
 
@@ -24,28 +25,33 @@ async def get_trending(
             else limit
         )
         if all_sites[site]["trending_available"]:
+            available_categories = all_sites[site].get(
+                "top_100_categories", all_sites[site]["categories"]
+            )
             if not category is None and not all_sites[site]["trending_category"]:
                 return error_handler(
                     status_code=status.HTTP_404_NOT_FOUND,
-                    json_message={
+                    message={
                         "error": "Search by trending category not available for {}.".format(
                             site
                         )
                     },
                 )
-            if not category is None and category not in all_sites[site]["categories"]:
+            if not category is None and category not in available_categories:
                 return error_handler(
                     status_code=status.HTTP_404_NOT_FOUND,
-                    json_message={
+                    message={
                         "error": "Selected category not available.",
-                        "available_categories": all_sites[site]["categories"],
+                        "available_categories": list(available_categories),
                     },
                 )
-            resp = await all_sites[site]["website"]().trending(category, page, limit)
+            resp = await run_in_threadpool(
+                all_sites[site]["website"]().trending, category, page, limit
+            )
             if resp is None:
                 return error_handler(
                     status_code=status.HTTP_403_FORBIDDEN,
-                    json_message={
+                    message={
                         "error": "Website Blocked Change IP or Website Domain."
                     },
                 )
@@ -54,16 +60,16 @@ async def get_trending(
             else:
                 return error_handler(
                     status_code=status.HTTP_404_NOT_FOUND,
-                    json_message={"error": "Result not found."},
+                    message={"error": "Result not found."},
                 )
         else:
             return error_handler(
                 status_code=status.HTTP_404_NOT_FOUND,
-                json_message={
+                message={
                     "error": "Trending search not availabe for {}.".format(site)
                 },
             )
     return error_handler(
         status_code=status.HTTP_404_NOT_FOUND,
-        json_message={"error": "Selected Site Not Available"},
+        message={"error": "Selected Site Not Available"},
     )
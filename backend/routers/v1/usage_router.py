@@ -0,0 +1,20 @@
+from fastapi import APIRouter, status
+from helper.error_messages import error_handler
+from helper.quotas import current_key
+
+router = APIRouter(tags=["Usage"])
+
+
+@router.get("")
+async def get_usage():
+    """
+    Quota and request accounting of the calling API key: remaining tokens, requests,
+    throttled requests, upstream scrapes and cache hits since the worker started.
+    """
+    quota = current_key.get()
+    if quota is None:
+        return error_handler(
+            status_code=status.HTTP_404_NOT_FOUND,
+            message={"error": "API keys are not configured."},
+        )
+    return error_handler(status_code=status.HTTP_200_OK, message=quota.usage())
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Preforked production launcher.
+
+The master imports the app and every scraper, exercises the parsers and loads the
+top100 snapshots, then freezes the heap and forks WEB_CONCURRENCY uvicorn workers
+that inherit that warm state copy-on-write.
+
+    WEB_CONCURRENCY=4 PORT=8011 python serve.py
+"""
+
+import gc
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Set before the app is imported: the cache backend defaults to the shared tier with several workers
+os.environ.setdefault("WEB_CONCURRENCY", str(multiprocessing.cpu_count()))
+
+from gunicorn.app.base import BaseApplication
+
+# Names run through the parsers so their regexes and caches are built in the master
+SAMPLE_NAMES = (
+    "The.Matrix.1999.1080p.BluRay.x264-GROUP",
+    "Dune Part Two (2024) [2160p] [WEBRip] [x265] [10bit] [5.1] [YTS.MX]",
+    "Some.Show.S02E05.720p.HDTV.x264-FLEET[eztv].mkv",
+)
+
+
+def warm_master():
+    """Load everything workers would otherwise build on their first requests."""
+    start = time.time()
+    from helper.is_site_available import all_sites
+    from helper.get_language import get_language
+    from helper.name_condenser import clean_concatenated_content, condense_torrent_name
+    from helper.release_parser import parse_release_names
+    from helper.top100_snapshots import snapshots
+    from helper.warmup import WARMUP_CATEGORIES
+
+    for config in all_sites.values():
+        config["website"].load()
+    parse_release_names(SAMPLE_NAMES)
+    for name in SAMPLE_NAMES:
+        condense_torrent_name(clean_concatenated_content(name))
+        get_language(name)
+
+    categories = snapshots.categories() if WARMUP_CATEGORIES == ["all"] else WARMUP_CATEGORIES
+    loaded = snapshots.preload(categories) if os.environ.get("PREFORK_SNAPSHOTS", "1") == "1" else 0
+    print(f"Master warmed in {time.time() - start:.1f}s ({loaded} top100 snapshots)")
+
+
+class PreforkApplication(BaseApplication):
+    def __init__(self, app, options):
+        self.application = app
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if key in self.cfg.settings and value is not None:
+                self.cfg.set(key, value)
+
+    def load(self):
+        return self.application
+
+
+def main():
+    from main import app
+
+    warm_master()
+    # Everything allocated so far is long lived: keep the collector from touching
+    # (and so copying) those pages in every worker
+    gc.freeze()
+
+    PreforkApplication(app, {
+        "bind": f"0.0.0.0:{os.environ.get('PORT', 8011)}",
+        "workers": int(os.environ["WEB_CONCURRENCY"]),
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        "preload_app": True,
+        "timeout": int(os.environ.get("WORKER_TIMEOUT", 120)),
+        "graceful_timeout": 30,
+        "keepalive": 5,
+    }).run()
+
+
+if __name__ == "__main__":
+    main()
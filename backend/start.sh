@@ -1,3 +1,9 @@
 #!/usr/bin/env bash
 # Start the FastAPI application with uvicorn
+# PREFORK=1 runs the preforked launcher instead: WEB_CONCURRENCY workers forked
+# from a warmed master (see serve.py)
+# Behind a reverse proxy set FORWARDED_ALLOW_IPS to it, so per-IP quotas see client addresses
+if [ "${PREFORK:-0}" = "1" ]; then
+    exec python serve.py
+fi
 uvicorn main:app --host 0.0.0.0 --port $PORT
@@ -0,0 +1,7 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("CACHE_BACKEND", "memory")
+os.environ.setdefault("TORRENT_INDEX_PATH", "")
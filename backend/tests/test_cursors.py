@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+from helper import cursors
+from helper.cursors import InvalidCursor, decode_cursor, encode_cursor, paginate, resume
+
+
+def _state(**overrides):
+    return {"q": "dune", "s": [["piratebay", 50]], "a": "max", "r": None, "n": 10, "o": 20, **overrides}
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(_state())
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == {
+        "q": "dune", "s": [("piratebay", 50)], "a": "max", "r": None, "n": 10, "o": 20,
+    }
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor", "e30", encode_cursor({"q": "dune"}), ""])
+def test_corrupted_cursor_is_rejected(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+
+def test_tampered_cursor_is_rejected_or_clamped():
+    with pytest.raises(InvalidCursor):
+        decode_cursor(encode_cursor(_state(s=[["example", 50]])))
+    with pytest.raises(InvalidCursor):
+        decode_cursor(encode_cursor(_state(o="x")))
+    state = decode_cursor(encode_cursor(_state(s=[["piratebay", 10 ** 6]], a="exec", n=10 ** 6, o=-5)))
+    assert state["s"] == [("piratebay", 50)]
+    assert state["a"] == "max"
+    assert state["n"] == cursors.MAX_PAGE_SIZE
+    assert state["o"] == 0
+
+
+def _fake_search(pages, requested):
+    async def search_site(site, query, page, limit):
+        requested.append((site, page))
+        return {"data": pages.get((site, page), [])}
+    return search_site
+
+
+def _rows(site, page, seeders):
+    return [
+        {"name": f"{site}-{page}-{s}", "seeders": s, "hash": f"{ord(site[0]):02x}{page:02x}{s:036x}"}
+        for s in seeders
+    ]
+
+
+def test_pages_are_merged_and_resumable(monkeypatch):
+    pages = {
+        ("piratebay", 1): _rows("piratebay", 1, [90, 70, 50]),
+        ("piratebay", 2): _rows("piratebay", 2, [30, 10]),
+        ("kickass", 1): _rows("kickass", 1, [80, 60, 40, 20]),
+    }
+    requested = []
+    monkeypatch.setattr(cursors, "search_site", _fake_search(pages, requested))
+    sites = [("piratebay", 50), ("kickass", 50)]
+
+    first = asyncio.run(paginate("cursor test", sites, 4))
+    assert [row["seeders"] for row in first["data"]] == [90, 80, 70, 60]
+    # Page 2 of a site is only fetched once its first page has run dry
+    assert ("piratebay", 2) not in requested
+
+    second = asyncio.run(resume(first["next_cursor"]))
+    assert second["offset"] == 4
+    assert [row["seeders"] for row in second["data"]] == [50, 40, 30, 20]
+
+    last = asyncio.run(resume(second["next_cursor"]))
+    assert [row["seeders"] for row in last["data"]] == [10]
+    assert last["next_cursor"] is None
+
+
+def test_cursor_resumed_by_another_worker_continues_the_set(monkeypatch):
+    pages = {
+        ("piratebay", 1): _rows("piratebay", 1, [90, 70]),
+        ("piratebay", 2): _rows("piratebay", 2, [30, 10]),
+        ("kickass", 1): _rows("kickass", 1, [80, 20]),
+    }
+    requested = []
+    monkeypatch.setattr(cursors, "search_site", _fake_search(pages, requested))
+    first = asyncio.run(paginate("other worker", [("piratebay", 50), ("kickass", 50)], 2))
+    fetched = list(requested)
+
+    # A worker that never saw this set only has the shared tier
+    monkeypatch.setattr(cursors, "_result_sets", cursors.TTLCache(ttl=60))
+    second = asyncio.run(resume(first["next_cursor"]))
+    assert [row["seeders"] for row in second["data"]] == [70, 30]
+    assert requested[:len(fetched)] == fetched
+    assert ("piratebay", 1) not in requested[len(fetched):]
+
+
+def test_shed_fetch_waits_for_its_siblings(monkeypatch):
+    finished = []
+
+    async def search_site(site, query, page, limit):
+        if site == "kickass":
+            raise cursors.OverloadedError()
+        await asyncio.sleep(0.05)
+        finished.append(site)
+        return {"data": _rows(site, page, [10])}
+
+    monkeypatch.setattr(cursors, "search_site", search_site)
+    with pytest.raises(cursors.OverloadedError):
+        asyncio.run(paginate("shed", [("piratebay", 50), ("kickass", 50)], 5))
+    assert finished == ["piratebay"]
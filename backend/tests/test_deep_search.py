@@ -0,0 +1,138 @@
+import asyncio
+
+import requests
+
+from helper.deep_search import DEEP_SEARCH_PARALLEL, search_pages
+from torrents import limetorrents
+from torrents.kickass import Kickass
+from torrents.pirate_bay import PirateBay
+
+PAGE_SIZE = PirateBay.PAGE_SIZE
+
+
+def _page(page, rows, page_rows=None):
+    data = [
+        {"name": f"{page}-{i}", "seeders": 1000 - page * 100 - i, "hash": f"{page:02x}{i:038x}"}
+        for i in range(rows)
+    ]
+    return {"data": data, "total": rows, "page_rows": rows if page_rows is None else page_rows}
+
+
+def _run(pages, depth):
+    requested = []
+
+    async def fetch(page):
+        requested.append(page)
+        await asyncio.sleep(0.01 * page)
+        return pages.get(page, _page(page, 0))
+
+    result = asyncio.run(search_pages("piratebay", "query", depth, 50, fetch=fetch))
+    return result, requested
+
+
+def test_stops_on_short_page():
+    pages = {1: _page(1, PAGE_SIZE), 2: _page(2, PAGE_SIZE), 3: _page(3, 5), 4: _page(4, PAGE_SIZE)}
+    result, requested = _run(pages, depth=8)
+    assert result["pages"] == 3
+    assert result["total"] == 2 * PAGE_SIZE + 5
+    assert not any(row["name"].startswith("4-") for row in result["data"])
+    assert max(requested) <= 3 + DEEP_SEARCH_PARALLEL - 1
+
+
+def test_filtered_rows_do_not_end_the_search():
+    # Pages whose rows were partly filtered by the scraper are still full upstream pages
+    pages = {page: _page(page, PAGE_SIZE - 1, page_rows=PAGE_SIZE) for page in (1, 2, 3)}
+    result, requested = _run(pages, depth=3)
+    assert result["pages"] == 3
+    assert sorted(requested) == [1, 2, 3]
+
+
+def test_ranked_and_deduped():
+    first = _page(1, PAGE_SIZE)
+    second = _page(2, 3)
+    second["data"].append({**first["data"][0], "seeders": 5000})
+    result, _ = _run({1: first, 2: second}, depth=2)
+    seeders = [row["seeders"] for row in result["data"]]
+    assert seeders == sorted(seeders, reverse=True)
+    assert result["total"] == PAGE_SIZE + 3
+    assert result["data"][0]["seeders"] == 5000
+
+
+def test_first_page_failure_returns_none():
+    result, _ = _run({1: None}, depth=3)
+    assert result is None
+
+
+class _Response:
+    def __init__(self, text, status=200):
+        self.text = text
+        self.status = status
+        self.encoding = "utf-8"
+        self.apparent_encoding = "utf-8"
+
+    def raise_for_status(self):
+        if self.status != 200:
+            raise requests.exceptions.HTTPError(str(self.status))
+
+
+def test_pirate_bay_counts_filtered_rows():
+    row = (
+        '<tr><td><div class="detName"><a class="detLink" href="/torrent/{i}">{name}</a></div>'
+        '<a href="magnet:?xt=urn:btih:{h}&dn=x">m</a>'
+        '<font class="detDesc">Uploaded 04-07 2023, Size 1 GiB, ULed by u</font></td>'
+        '<td>{s}</td><td>1</td></tr>'
+    )
+    names = ["Movie {i} 1080p", "Movie {i} 1080p", "Film {i} French 1080p"]
+    html = '<table id="searchResult"><tr><th>Name</th></tr>' + "".join(
+        row.format(i=i, name=names[i % 3].format(i=i), h=f"{i:040x}", s=0 if i in (1, 4) else 10)
+        for i in range(1, 8)
+    ) + "</table>"
+    rows, page_rows = PirateBay()._parse_rows(html)
+    # 7 upstream rows: the header is not one, two have no seeders and two are French
+    assert page_rows == 7
+    assert sorted(row["name"] for row in rows) == ["Movie 3 1080p", "Movie 6 1080p", "Movie 7 1080p"]
+
+
+def test_kickass_counts_filtered_rows(monkeypatch):
+    row = (
+        '<tr class="{cls}"><td><a class="cellMainLink" href="/t{i}.html">Movie {i} 1080p</a></td>'
+        '<td>1 GB</td><td>u</td><td>1 year</td><td>{s}</td><td>1</td></tr>'
+    )
+    html = '<table class="data"><tr class="firstr"><th>Name</th></tr>' + "".join(
+        row.format(cls="odd" if i % 2 else "even", i=i, s=0 if i == 2 else 10) for i in range(1, 6)
+    ) + "</table>"
+
+    def get(url, timeout=None):
+        if "/usearch/" in url:
+            return _Response(html)
+        if url.endswith("/t5.html"):
+            return _Response("", status=404)
+        i = int(url.rsplit("/t", 1)[1].split(".")[0])
+        return _Response(f'<a class="kaGiantButton" href="magnet:?xt=urn:btih:{i:040x}">m</a>')
+
+    kickass = Kickass()
+    monkeypatch.setattr(kickass.scraper, "get", get)
+    results = kickass.search("movie", 1, 0)
+    # 5 upstream rows: one has no seeders and one has no magnet link
+    assert results["page_rows"] == 5
+    assert results["total"] == 3
+
+
+def test_limetorrents_counts_rows_before_the_limit(monkeypatch):
+    row = (
+        '<tr><td><a href="https://itorrents.org/torrent/{h}.torrent?title={slug}">t</a>'
+        '<a href="/{slug}-torrent-{i}.html">{name}</a></td>'
+        '<td>1 year</td><td>1 GB</td><td>{s}</td><td>1</td><td>x</td></tr>'
+    )
+    names = ["Movie {i} 1080p", "Film {i} French 1080p", "Movie {i} 1080p"]
+    html = '<table class="table2"><tr><th>Name</th></tr>' + "".join(
+        row.format(
+            h=f"{i:040x}", i=i, slug=f"torrent-{i}", name=names[i % 3].format(i=i), s=0 if i == 3 else 10,
+        )
+        for i in range(1, 7)
+    ) + "</table>"
+    monkeypatch.setattr(limetorrents.requests, "get", lambda url, headers=None, timeout=None: _Response(html))
+    results = limetorrents.Limetorrents().search("movie", 1, 2)
+    # 6 upstream rows whatever the limit: one has no seeders and two are French
+    assert results["page_rows"] == 6
+    assert results["total"] == 2
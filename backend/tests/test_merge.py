@@ -0,0 +1,53 @@
+import base64
+import binascii
+
+from helper.merge import merge_by_infohash, normalize_infohash, top_k_merge
+
+HEX = "a" * 39 + "b"
+
+
+def _stream(site, seeders):
+    return [{"name": f"{site}-{s}", "site": site, "seeders": s} for s in seeders]
+
+
+def test_top_k_merge_keeps_order_across_streams():
+    streams = [_stream("a", [90, 40, 10]), _stream("b", [80, 70, 5]), _stream("c", [])]
+    merged = top_k_merge(streams)
+    assert [row["seeders"] for row in merged] == [90, 80, 70, 40, 10, 5]
+
+
+def test_top_k_merge_stops_at_limit():
+    streams = [_stream("a", [90, 40, 10]), _stream("b", [80, 70, 5])]
+    assert [row["name"] for row in top_k_merge(streams, 3)] == ["a-90", "b-80", "b-70"]
+    assert len(top_k_merge(streams, 0)) == 6
+
+
+def test_top_k_merge_treats_missing_seeders_as_zero():
+    streams = [[{"name": "x", "seeders": 3}, {"name": "y", "seeders": None}], [{"name": "z"}]]
+    assert [row["name"] for row in top_k_merge(streams)] == ["x", "y", "z"]
+
+
+def test_normalize_infohash():
+    base32 = base64.b32encode(binascii.unhexlify(HEX)).decode()
+    assert normalize_infohash(HEX.upper()) == HEX
+    assert normalize_infohash(base32) == HEX
+    assert normalize_infohash("0" * 40) is None
+    assert normalize_infohash("not a hash") is None
+    assert normalize_infohash(None) is None
+
+
+def test_merge_by_infohash_aggregates_and_keeps_sources():
+    base32 = base64.b32encode(binascii.unhexlify(HEX)).decode()
+    rows = [
+        {"name": "best", "site": "a", "url": "a/1", "hash": HEX, "seeders": 50, "leechers": 5},
+        {"name": "other", "site": "b", "url": "b/1", "hash": None, "seeders": 40, "leechers": 4},
+        {"name": "copy", "site": "c", "url": "c/1", "hash": base32, "seeders": 30, "leechers": 9},
+    ]
+    merged = merge_by_infohash(rows, "sum")
+    assert [row["name"] for row in merged] == ["best", "other"]
+    assert merged[0]["hash"] == HEX
+    assert (merged[0]["seeders"], merged[0]["leechers"]) == (80, 14)
+    assert merged[0]["sources"] == [{"site": "a", "url": "a/1"}, {"site": "c", "url": "c/1"}]
+
+    merged = merge_by_infohash(rows, "max")
+    assert (merged[0]["seeders"], merged[0]["leechers"]) == (50, 9)
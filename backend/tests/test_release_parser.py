@@ -0,0 +1,66 @@
+import pytest
+
+from helper import title_match
+from helper.release_parser import filter_by_release, parse_release_name, parse_release_names, title_key
+
+
+@pytest.mark.parametrize("name, expected", [
+    (
+        "The.Matrix.1999.1080p.BluRay.x264-GROUP",
+        {"title": "The Matrix", "year": 1999, "resolution": "1080p", "codec": "H.264",
+         "source": "BluRay", "group": "GROUP"},
+    ),
+    (
+        "Dune Part Two (2024) [2160p] [WEBRip] [x265] [10bit] [5.1] [YTS.MX]",
+        {"title": "Dune Part Two", "year": 2024, "resolution": "2160p", "codec": "H.265",
+         "source": "WEBRip", "group": None},
+    ),
+    (
+        "Some.Show.S02E05.720p.HDTV.x264-FLEET[eztv].mkv",
+        {"title": "Some Show", "season": 2, "episode": 5, "resolution": "720p", "source": "HDTV",
+         "group": "FLEET"},
+    ),
+    ("Show 3x07 HDTV", {"title": "Show", "season": 3, "episode": 7}),
+    ("1917 2019 1080p WEB-DL", {"title": "1917", "year": 2019, "source": "WEB-DL"}),
+    ("Movie 4K HEVC", {"title": "Movie", "resolution": "2160p", "codec": "H.265"}),
+    ("just a name", {"title": "just a name", "year": None, "resolution": None, "group": None}),
+])
+def test_parse_release_name(name, expected):
+    parsed = parse_release_name(name)
+    assert {field: parsed[field] for field in expected} == expected
+
+
+def test_parse_release_name_without_name():
+    assert set(parse_release_name("").values()) == {None}
+
+
+def test_parse_release_names_parses_each_name_once():
+    names = ["A.2001.720p", "B.2002.1080p", "A.2001.720p"]
+    assert list(parse_release_names(names)) == ["A.2001.720p", "B.2002.1080p"]
+
+
+def test_filter_by_release():
+    rows = [{"name": n, "release": parse_release_name(n)} for n in ("A.2001.720p", "B.2002.1080p")]
+    assert [row["name"] for row in filter_by_release(rows, resolution="1080P")] == ["B.2002.1080p"]
+    assert filter_by_release(rows, resolution=None) == rows
+    assert filter_by_release([{"name": "x"}], resolution="720p") == []
+
+
+def test_title_key():
+    assert title_key("The Lord of the Rings: The Two Towers") == "lord of the rings the two towers"
+    assert title_key("Amélie & Co") == "amelie and co"
+    assert title_key(None) == ""
+
+
+def _indexed(name):
+    release = parse_release_name(name)
+    return {"release": release, "title_key": title_key(release["title"])}
+
+
+def test_title_score_weighs_year_and_rejects_episodes():
+    key = title_key("The Matrix")
+    assert title_match._score(key, _indexed("The.Matrix.1999.1080p.BluRay.x264-G"), 1999) == 1.0
+    assert title_match._score(key, _indexed("The.Matrix.2000.1080p.BluRay.x264-G"), 1999) == 0.85
+    assert title_match._score(key, _indexed("The.Matrix.2003.1080p.BluRay.x264-G"), 1999) == 0.0
+    assert title_match._score(key, _indexed("The.Matrix.S01E01.720p.HDTV"), None) == 0.0
+    assert title_match._score(key, _indexed("Some.Other.Film.1999.1080p"), 1999) == 0.0
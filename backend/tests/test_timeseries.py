@@ -0,0 +1,33 @@
+import base64
+import binascii
+
+from helper import timeseries as ts
+from helper.timeseries import TimeSeriesStore
+
+HEX = "ab" * 20
+
+
+def test_hex_and_base32_reports_share_one_series(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ts.time, "time", lambda: now[0])
+    store = TimeSeriesStore()
+    base32 = base64.b32encode(binascii.unhexlify(HEX)).decode()
+    store.record([{"name": "Movie.2024.1080p", "hash": HEX.upper(), "seeders": 10, "magnet": "m", "size": "1 GB"}], 1, "A")
+    now[0] += 3600
+    store.record([{"name": "Movie.2024.1080p", "hash": base32, "seeders": 30, "leechers": 2}], 1, "A")
+    assert len(store) == 1
+
+    (row,) = store.trending(5)
+    assert row["hash"] == HEX
+    assert row["velocity"] == 20.0
+    assert (row["seeders"], row["leechers"]) == (30, 2)
+    assert row["magnet"].startswith(f"magnet:?xt=urn:btih:{HEX}&dn=")
+    assert row["release"]["resolution"] == "1080p"
+    # Only the hash, name and site are kept of the recorded row
+    assert "size" not in row
+
+
+def test_rows_without_a_usable_hash_are_skipped():
+    store = TimeSeriesStore()
+    store.record([{"name": "x", "hash": None}, {"name": "y", "hash": "0" * 40}, {"name": "z", "hash": "bad"}])
+    assert len(store) == 0
@@ -0,0 +1,84 @@
+import json
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from helper.top100_snapshots import Snapshot, diff, snapshots
+from routers.v1.top100_router import router
+
+CATEGORY = "music"
+
+
+def _row(n, seeders, leechers=1):
+    return {"name": f"t{n}", "hash": f"{n:040x}", "seeders": seeders, "leechers": leechers}
+
+
+def _payload(version, rows):
+    return {"category_id": 101, "data": rows, "time": 0, "version": version, "created": time.time()}
+
+
+@pytest.fixture
+def store(monkeypatch):
+    monkeypatch.setattr(snapshots, "_snapshots", {})
+    monkeypatch.setattr(snapshots, "_history", {})
+    monkeypatch.setattr(snapshots, "_subscribers", {})
+    # Only what the test adopts, nothing from the shared tier
+    monkeypatch.setattr(snapshots, "_synced", {CATEGORY: float("inf")})
+    return snapshots
+
+
+def test_diff_added_removed_changed():
+    old = Snapshot(CATEGORY, 101, [_row(1, 50), _row(2, 40), _row(3, 30), _row(4, 20)])
+    new = Snapshot(CATEGORY, 101, [_row(2, 45), _row(1, 50), _row(3, 30, leechers=7), _row(5, 10)])
+    changes = diff(old, new)
+    assert [row["hash"] for row in changes["added"]] == [f"{5:040x}"]
+    assert changes["added"][0]["rank"] == 4
+    assert changes["removed"] == [f"{4:040x}"]
+    assert {row["hash"]: (row["previous_rank"], row["rank"]) for row in changes["changed"]} == {
+        f"{2:040x}": (2, 1),
+        f"{1:040x}": (1, 2),
+        f"{3:040x}": (3, 3),
+    }
+
+
+def test_diff_of_identical_snapshots_is_empty():
+    rows = [_row(1, 50), _row(2, 40)]
+    assert diff(Snapshot(CATEGORY, 101, rows), Snapshot(CATEGORY, 101, rows)) == {
+        "added": [], "removed": [], "changed": [],
+    }
+
+
+def test_diff_endpoint_falls_back_to_full(store):
+    store._adopt(CATEGORY, _payload(1, [_row(1, 50), _row(2, 40)]))
+    store._adopt(CATEGORY, _payload(2, [_row(2, 60), _row(3, 10)]))
+    app = FastAPI()
+    app.include_router(router, prefix="/top100")
+    client = TestClient(app)
+
+    delta = client.get(f"/top100/category/{CATEGORY}/diff", params={"since": 1}).json()
+    assert delta["full"] is False
+    assert delta["version"] == 2
+    assert [row["hash"] for row in delta["added"]] == [f"{3:040x}"]
+    assert delta["removed"] == [f"{1:040x}"]
+
+    for since in (0, 99):
+        full = client.get(f"/top100/category/{CATEGORY}/diff", params={"since": since}).json()
+        assert full["full"] is True
+        assert [row["hash"] for row in full["data"]] == [f"{2:040x}", f"{3:040x}"]
+
+
+def test_new_version_is_pushed_to_subscribers(store):
+    store._adopt(CATEGORY, _payload(1, [_row(1, 50)]))
+    queue = store.subscribe(CATEGORY)
+    store._adopt(CATEGORY, _payload(2, [_row(1, 50), _row(2, 40)]))
+    # An older or repeated version is not published again
+    store._adopt(CATEGORY, _payload(2, [_row(1, 50), _row(2, 40)]))
+    frame = queue.get_nowait().decode()
+    assert queue.empty()
+    event, version, data = frame.strip().split("\n")
+    assert (event, version) == ("event: delta", "id: 2")
+    data = json.loads(data[len("data: "):])
+    assert (data["since"], data["version"]) == (1, 2)
+    assert [row["hash"] for row in data["added"]] == [f"{2:040x}"]
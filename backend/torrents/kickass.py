@@ -6,8 +6,13 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 from bs4 import BeautifulSoup
 from helper.get_language import get_language
 from helper.name_condenser import condense_torrent_name, clean_concatenated_content
+from helper.rate_limit import host_limiter
+from helper.release_parser import parse_release_name
+from helper.torrent_index import torrent_index
 class Kickass:
     _name = "Kickass"
+    # Rows on a full search results page; fewer means it was the last one
+    PAGE_SIZE = 25
 
     def __init__(self):
         self.BASE_URL = "https://katcr.to"
@@ -16,7 +21,8 @@ class Kickass:
 
     def _get_magnet_link(self, page_url):
         try:
-            response = self.scraper.get(page_url, timeout=10)
+            with host_limiter.slot(page_url):
+                response = self.scraper.get(page_url, timeout=10)
             response.raise_for_status()
             soup = BeautifulSoup(response.text, "html.parser")
             magnet_link = soup.find('a', class_='kaGiantButton').get('href')
@@ -30,7 +36,8 @@ class Kickass:
         
         url = f"{self.BASE_URL}/usearch/{query}/{page}/"
         try:
-            response = self.scraper.get(url, timeout=10)
+            with host_limiter.slot(url):
+                response = self.scraper.get(url, timeout=10)
             response.raise_for_status()
         except Exception as e:
             print(f"Kickass search error: {e}")
@@ -114,7 +121,8 @@ class Kickass:
                             'date': torrent_info['date'],
                             'language': torrent_info['language'],
                             'magnet': magnet_link,
-                            'hash': hash_match.group(1) if hash_match else None
+                            'hash': hash_match.group(1) if hash_match else None,
+                            'release': parse_release_name(torrent_info['name'])
                         })
                 except Exception as e:
                     print(f"Error processing torrent {torrent_info['name']}: {e}")
@@ -123,9 +131,12 @@ class Kickass:
                     # This doesn't immediately stop other futures, but prevents adding more results
                     break
         
+        torrent_index.upsert(results["data"], self._name)
         results["data"].sort(key=lambda x: x.get("seeders", 0), reverse=True)
         results["time"] = time.time() - start_time
         results["total"] = len(results["data"])
+        # Upstream rows before seeder and magnet filtering, for deep search paging
+        results["page_rows"] = sum(1 for torrent in torrent_list if not torrent.find('th'))
         return results
 
     def trending(self, category, page, limit):
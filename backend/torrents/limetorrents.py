@@ -5,6 +5,9 @@ import html
 from bs4 import BeautifulSoup
 from helper.get_language import get_language
 from helper.name_condenser import condense_torrent_name, clean_concatenated_content
+from helper.rate_limit import host_limiter
+from helper.release_parser import parse_release_name
+from helper.torrent_index import torrent_index
 
 def fix_encoding_issues(text):
     """Comprehensive function to fix common encoding issues"""
@@ -55,6 +58,8 @@ def fix_encoding_issues(text):
 
 class Limetorrents:
     _name = "Limetorrents"
+    # Rows on a full search results page; fewer means it was the last one
+    PAGE_SIZE = 20
 
     def __init__(self):
         self.BASE_URL = "https://www.limetorrents.info"
@@ -70,7 +75,8 @@ class Limetorrents:
         
         url = f"{self.BASE_URL}/search/all/{query.strip()}/seeds/{page}/"
         try:
-            response = requests.get(url, headers=self.headers, timeout=10)
+            with host_limiter.slot(url):
+                response = requests.get(url, headers=self.headers, timeout=10)
             response.raise_for_status()
             
             # Try multiple encoding approaches
@@ -96,6 +102,8 @@ class Limetorrents:
         torrent_rows = soup.select("table.table2 tr")
         
         results = {"data": []}
+        # Upstream rows before the limit, for deep search paging
+        results["page_rows"] = sum(1 for row in torrent_rows if row.find("td") and not row.find("th"))
         for row in torrent_rows:
             if row.find("th") or not row.find("td"):
                 continue
@@ -223,6 +231,7 @@ class Limetorrents:
                     "language": lang,
                     "hash": torrent_hash,
                     "magnet": magnet_link,
+                    "release": parse_release_name(name),
                 })
 
                 if self.LIMIT and len(results["data"]) >= self.LIMIT:
@@ -231,6 +240,7 @@ class Limetorrents:
             except (IndexError, AttributeError) as e:
                 continue
         
+        torrent_index.upsert(results["data"], self._name)
         results["data"].sort(key=lambda x: x.get("seeders", 0), reverse=True)
         results["time"] = time.time() - start_time
         results["total"] = len(results["data"])
@@ -1,70 +1,78 @@
+import os
 import time
 import requests
 from bs4 import BeautifulSoup
 from datetime import datetime
 from urllib.parse import quote
+from helper.cache import make_cache
+from helper.merge import top_k_merge
+from helper.rate_limit import host_limiter
+from helper.release_parser import parse_release_name
 from helper.get_language import get_language
 from helper.name_condenser import condense_torrent_name, clean_concatenated_content
+from helper.timeseries import timeseries
+from helper.torrent_index import torrent_index
 import re
 
+# Parsed browse pages keyed by (category_id, page), shared by every PirateBay instance
+# so /top100/movies, /top100/category/* and /top100/multi never fetch the same page twice.
+_browse_cache = make_cache("browse", ttl=int(os.environ.get("BROWSE_CACHE_TTL", 300)), maxsize=512)
+
 class PirateBay:
     _name = "Pirate Bay"
-    
+    # Rows on a full search results page; fewer means it was the last one
+    PAGE_SIZE = 30
+
     def __init__(self):
         self.BASE_URL = "https://thehiddenbay.com"
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.106 Safari/537.36'
         }
 
-    def search(self, query, page, limit):
-        start_time = time.time()
-        # Traditional Pirate Bay search URL format
-        search_url = f"{self.BASE_URL}/search/{quote(query)}/{page}/99/0"
-        try:
-            response = requests.get(search_url, headers=self.headers, timeout=15)
-            response.raise_for_status()
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching {search_url}: {e}")
-            return None
+    def _parse_rows(self, page_html):
+        """
+        Parse the rows of a search or browse results table.
+        Returns the parsed rows and the number of upstream rows before any were filtered out.
+        """
+        soup = BeautifulSoup(page_html, 'html.parser')
+        rows = []
 
-        soup = BeautifulSoup(response.text, 'html.parser')
-        results = {"data": []}
-        
-        # Find all table rows in the search results table
+        # Find all table rows in the results table
         torrent_rows = soup.select('table#searchResult tr')
-        
+        page_rows = sum(1 for row in torrent_rows if not row.find('th'))
+
         for row in torrent_rows:
             # Skip header rows
             if row.find('th'):
                 continue
-                
+
             # Extract data from font elements
             desc_font = row.find('font', class_='detDesc')
             if not desc_font:
                 continue
-                
+
             desc_text = desc_font.text
             # Parse description text (e.g., "Uploaded 04-07 2023, Size 1.23 GiB, ULed by username")
             desc_parts = desc_text.replace('Uploaded', '').replace('ULed', 'Uploaded').split(',')
             if len(desc_parts) < 3:
                 continue
-                
+
             date_str = desc_parts[0].strip()
             size_str = desc_parts[1].replace('Size', '').strip()
             uploader = desc_parts[2].replace('by', '').strip()
-            
+
             # Extract magnet link
             magnet_link = row.select_one('td div.detName + a')
             if not magnet_link:
                 continue
             magnet_href = magnet_link.get('href')
-            
+
             # Extract hash from magnet link
             hash_match = magnet_href.split('btih:')
             if len(hash_match) < 2:
                 continue
             torrent_hash = hash_match[1].split('&')[0]
-            
+
             # Extract name
             name_link = row.select_one('a.detLink')
             if not name_link:
@@ -73,35 +81,35 @@ class PirateBay:
             name = name_link.text.strip()
             name = clean_concatenated_content(name)
             # name = condense_torrent_name(name)  # Disabled to show full names
-            
+
             # Filter for English language
             lang = get_language(name)
             if lang != "English":
                 continue
-            
+
             # Extract seeders and leechers
             seeders_elem = row.select('td')[-2] if len(row.select('td')) >= 2 else None
             leechers_elem = row.select('td')[-1] if len(row.select('td')) >= 1 else None
-            
+
             if not seeders_elem or not leechers_elem:
                 continue
-                
+
             # Handle seeders conversion with error handling
             try:
                 seeders = int(seeders_elem.text.strip().replace(',', '').replace(' ', ''))
             except (ValueError, IndexError):
                 seeders = 0
-                
+
             # Handle leechers conversion with error handling
             try:
                 leechers = int(leechers_elem.text.strip().replace(',', '').replace(' ', ''))
             except (ValueError, IndexError):
                 leechers = 0
-            
+
             # Filter out torrents with 0 seeders
             if seeders < 1:
                 continue
-            
+
             # Extract URL
             url = name_link.get('href')
             if url:
@@ -109,8 +117,8 @@ class PirateBay:
                     url = self.BASE_URL + url
                 elif not url.startswith('http'):
                     url = self.BASE_URL + '/' + url
-            
-            results["data"].append({
+
+            rows.append({
                 "name": name,
                 "size": size_str,
                 "seeders": seeders,
@@ -121,8 +129,28 @@ class PirateBay:
                 "language": lang,
                 "hash": torrent_hash,
                 "magnet": magnet_href,
+                "release": parse_release_name(name),
             })
 
+        return rows, page_rows
+
+    def search(self, query, page, limit):
+        start_time = time.time()
+        # Traditional Pirate Bay search URL format
+        search_url = f"{self.BASE_URL}/search/{quote(query)}/{page}/99/0"
+        try:
+            with host_limiter.slot(search_url):
+                response = requests.get(search_url, headers=self.headers, timeout=15)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            print(f"Error fetching {search_url}: {e}")
+            return None
+
+        rows, page_rows = self._parse_rows(response.text)
+        # Upstream rows before language and seeder filtering, for deep search paging
+        results = {"data": rows, "page_rows": page_rows}
+        torrent_index.upsert(results["data"], self._name)
+
         results["data"].sort(key=lambda x: x.get("seeders", 0), reverse=True)
         if limit and len(results["data"]) > limit:
             results["data"] = results["data"][:limit]
@@ -131,286 +159,102 @@ class PirateBay:
         results["total"] = len(results["data"])
         return results
 
+    def _category_id(self, category):
+        # Imported here, is_site_available imports this module
+        from helper.is_site_available import all_sites
+        return all_sites["piratebay"]["top_100_categories"].get(category)
+
+    def _local_list(self, rows_for, category, page, limit):
+        start_time = time.time()
+        category_id = self._category_id(category) if category else None
+        rows = rows_for(page * limit, category_id)[(page - 1) * limit:]
+        return {"data": rows, "time": time.time() - start_time, "total": len(rows)}
+
     def trending(self, category, page, limit):
-        # The website does not support trending queries.
-        return None
+        """
+        Trending torrents by seeder growth, computed locally from the seeder history
+        recorded on every browse page fetch. The website does not support trending queries.
+        """
+        return self._local_list(timeseries.trending, category, page, limit)
 
     def recent(self, category, page, limit):
-        # The website does not support recent queries.
-        return None
-    
+        """
+        Most recently first-seen torrents from the locally recorded browse pages.
+        The website does not support recent queries.
+        """
+        return self._local_list(timeseries.recent, category, page, limit)
+
+    def _fetch_browse_page(self, category_id, page):
+        # Browse URL format: /browse/CATEGORY_ID/PAGE/7/0 (7 = sort by seeders)
+        browse_url = f"{self.BASE_URL}/browse/{category_id}/{page}/7/0"
+        try:
+            with host_limiter.slot(browse_url):
+                response = requests.get(browse_url, headers=self.headers, timeout=15)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            print(f"Error fetching {browse_url}: {e}")
+            return None
+        rows, _ = self._parse_rows(response.text)
+        # Sorted once here so cached pages can be k-way merged by top100_category
+        rows.sort(key=lambda x: x.get("seeders", 0), reverse=True)
+        timeseries.record(rows, category_id, self._name)
+        torrent_index.upsert(rows, self._name)
+        return rows
+
+    def browse_page(self, category_id, page):
+        """
+        Get the parsed rows of one browse page, or None if the fetch failed.
+        Pages are cached and concurrent requests for the same page share one fetch.
+        """
+        return _browse_cache.get_or_set(
+            (category_id, page), lambda: self._fetch_browse_page(category_id, page)
+        )
+
+    @staticmethod
+    def _browse_pages(page, limit):
+        """Browse pages behind a top100 page; ~30 results per page, so 100 rows take 4 pages."""
+        return range(page, page + max(1, (limit + 29) // 30))
+
+    def browse_cached(self, category_id, page=1, limit=100):
+        """True when every browse page behind a top100 page is cached, so it needs no fetch."""
+        return all(
+            _browse_cache.get((category_id, current_page)) is not None
+            for current_page in self._browse_pages(page, limit)
+        )
+
     def top100_movies(self, page=1, limit=100):
         """Get top 100 movies from Pirate Bay browse page by fetching multiple pages"""
-        start_time = time.time()
-        all_results = []
-        
-        # Calculate how many pages we need to fetch to get the desired limit
-        # Assuming ~30 results per page, we need at least 4 pages to get 100+ results
-        pages_needed = max(1, (limit + 29) // 30)  # Round up division
-        
-        for current_page in range(page, page + pages_needed):
-            # Browse URL format: /browse/207/PAGE/7/0 (207 = Video/Movies category, 7 = sort by seeders)
-            browse_url = f"{self.BASE_URL}/browse/207/{current_page}/7/0"
-            
-            try:
-                response = requests.get(browse_url, headers=self.headers, timeout=15)
-                response.raise_for_status()
-            except requests.exceptions.RequestException as e:
-                print(f"Error fetching {browse_url}: {e}")
-                if current_page == page:  # If first page fails, return None
-                    return None
-                else:  # If subsequent pages fail, continue with what we have
-                    break
+        # 207 = Video/HD Movies category, shares browse pages with /top100/category/hd_movies
+        return self.top100_category(207, page, limit)
 
-            soup = BeautifulSoup(response.text, 'html.parser')
-            page_results = []
-            
-            # Find all table rows in the browse results table
-            torrent_rows = soup.select('table#searchResult tr')
-            
-            for row in torrent_rows:
-                # Skip header rows
-                if row.find('th'):
-                    continue
-                    
-                # Extract data from font elements
-                desc_font = row.find('font', class_='detDesc')
-                if not desc_font:
-                    continue
-                    
-                desc_text = desc_font.text
-                # Parse description text (e.g., "Uploaded 04-07 2023, Size 1.23 GiB, ULed by username")
-                desc_parts = desc_text.replace('Uploaded', '').replace('ULed', 'Uploaded').split(',')
-                if len(desc_parts) < 3:
-                    continue
-                    
-                date_str = desc_parts[0].strip()
-                size_str = desc_parts[1].replace('Size', '').strip()
-                uploader = desc_parts[2].replace('by', '').strip()
-                
-                # Extract magnet link
-                magnet_link = row.select_one('td div.detName + a')
-                if not magnet_link:
-                    continue
-                magnet_href = magnet_link.get('href')
-                
-                # Extract hash from magnet link
-                hash_match = magnet_href.split('btih:')
-                if len(hash_match) < 2:
-                    continue
-                torrent_hash = hash_match[1].split('&')[0]
-                
-                # Extract name
-                name_link = row.select_one('a.detLink')
-                if not name_link:
-                    continue
-                # Clean name but don't condense (keep full name)
-                name = name_link.text.strip()
-                name = clean_concatenated_content(name)
-                # name = condense_torrent_name(name)  # Disabled to show full names
-                
-                # Filter for English language
-                lang = get_language(name)
-                if lang != "English":
-                    continue
-                
-                # Extract seeders and leechers
-                seeders_elem = row.select('td')[-2] if len(row.select('td')) >= 2 else None
-                leechers_elem = row.select('td')[-1] if len(row.select('td')) >= 1 else None
-                
-                if not seeders_elem or not leechers_elem:
-                    continue
-                    
-                # Handle seeders conversion with error handling
-                try:
-                    seeders = int(seeders_elem.text.strip().replace(',', '').replace(' ', ''))
-                except (ValueError, IndexError):
-                    seeders = 0
-                    
-                # Handle leechers conversion with error handling
-                try:
-                    leechers = int(leechers_elem.text.strip().replace(',', '').replace(' ', ''))
-                except (ValueError, IndexError):
-                    leechers = 0
-                
-                # Filter out torrents with 0 seeders
-                if seeders < 1:
-                    continue
-                
-                # Extract URL
-                url = name_link.get('href')
-                if url:
-                    if url.startswith('/'):
-                        url = self.BASE_URL + url
-                    elif not url.startswith('http'):
-                        url = self.BASE_URL + '/' + url
-                
-                page_results.append({
-                    "name": name,
-                    "size": size_str,
-                    "seeders": seeders,
-                    "leechers": leechers,
-                    "uploader": uploader,
-                    "url": url,
-                    "date": date_str,
-                    "language": lang,
-                    "hash": torrent_hash,
-                    "magnet": magnet_href,
-                })
-            
-            all_results.extend(page_results)
-            
-            # If we have enough results or this page returned no results, stop fetching
-            if len(all_results) >= limit or len(page_results) == 0:
-                break
-        
-        # Sort all results by seeders (descending) and limit to requested amount
-        all_results.sort(key=lambda x: x.get("seeders", 0), reverse=True)
-        if limit and len(all_results) > limit:
-            all_results = all_results[:limit]
-        
-        results = {
-            "data": all_results,
-            "time": time.time() - start_time,
-            "total": len(all_results)
-        }
-        
-        return results
-    
     def top100_category(self, category_id, page=1, limit=100):
         """Get top 100 torrents from a specific category from Pirate Bay browse page"""
         start_time = time.time()
-        all_results = []
-        
-        # Calculate how many pages we need to fetch to get the desired limit
-        # Assuming ~30 results per page, we need at least 4 pages to get 100+ results
-        pages_needed = max(1, (limit + 29) // 30)  # Round up division
-        
-        for current_page in range(page, page + pages_needed):
-            # Browse URL format: /browse/CATEGORY_ID/PAGE/7/0 (7 = sort by seeders)
-            browse_url = f"{self.BASE_URL}/browse/{category_id}/{current_page}/7/0"
-            
-            try:
-                response = requests.get(browse_url, headers=self.headers, timeout=15)
-                response.raise_for_status()
-            except requests.exceptions.RequestException as e:
-                print(f"Error fetching {browse_url}: {e}")
+        pages = []
+        fetched = 0
+
+        for current_page in self._browse_pages(page, limit):
+            page_results = self.browse_page(category_id, current_page)
+            if page_results is None:
                 if current_page == page:  # If first page fails, return None
                     return None
                 else:  # If subsequent pages fail, continue with what we have
                     break
 
-            soup = BeautifulSoup(response.text, 'html.parser')
-            page_results = []
-            
-            # Find all table rows in the browse results table
-            torrent_rows = soup.select('table#searchResult tr')
-            
-            for row in torrent_rows:
-                # Skip header rows
-                if row.find('th'):
-                    continue
-                    
-                # Extract data from font elements
-                desc_font = row.find('font', class_='detDesc')
-                if not desc_font:
-                    continue
-                    
-                desc_text = desc_font.text
-                # Parse description text (e.g., "Uploaded 04-07 2023, Size 1.23 GiB, ULed by username")
-                desc_parts = desc_text.replace('Uploaded', '').replace('ULed', 'Uploaded').split(',')
-                if len(desc_parts) < 3:
-                    continue
-                    
-                date_str = desc_parts[0].strip()
-                size_str = desc_parts[1].replace('Size', '').strip()
-                uploader = desc_parts[2].replace('by', '').strip()
-                
-                # Extract magnet link
-                magnet_link = row.select_one('td div.detName + a')
-                if not magnet_link:
-                    continue
-                magnet_href = magnet_link.get('href')
-                
-                # Extract hash from magnet link
-                hash_match = magnet_href.split('btih:')
-                if len(hash_match) < 2:
-                    continue
-                torrent_hash = hash_match[1].split('&')[0]
-                
-                # Extract name
-                name_link = row.select_one('a.detLink')
-                if not name_link:
-                    continue
-                # Clean name but don't condense (keep full name)
-                name = name_link.text.strip()
-                name = clean_concatenated_content(name)
-                # name = condense_torrent_name(name)  # Disabled to show full names
-                
-                # Filter for English language
-                lang = get_language(name)
-                if lang != "English":
-                    continue
-                
-                # Extract seeders and leechers
-                seeders_elem = row.select('td')[-2] if len(row.select('td')) >= 2 else None
-                leechers_elem = row.select('td')[-1] if len(row.select('td')) >= 1 else None
-                
-                if not seeders_elem or not leechers_elem:
-                    continue
-                    
-                # Handle seeders conversion with error handling
-                try:
-                    seeders = int(seeders_elem.text.strip().replace(',', '').replace(' ', ''))
-                except (ValueError, IndexError):
-                    seeders = 0
-                    
-                # Handle leechers conversion with error handling
-                try:
-                    leechers = int(leechers_elem.text.strip().replace(',', '').replace(' ', ''))
-                except (ValueError, IndexError):
-                    leechers = 0
-                
-                # Filter out torrents with 0 seeders
-                if seeders < 1:
-                    continue
-                
-                # Extract URL
-                url = name_link.get('href')
-                if url:
-                    if url.startswith('/'):
-                        url = self.BASE_URL + url
-                    elif not url.startswith('http'):
-                        url = self.BASE_URL + '/' + url
-                
-                page_results.append({
-                    "name": name,
-                    "size": size_str,
-                    "seeders": seeders,
-                    "leechers": leechers,
-                    "uploader": uploader,
-                    "url": url,
-                    "date": date_str,
-                    "language": lang,
-                    "hash": torrent_hash,
-                    "magnet": magnet_href,
-                })
-            
-            all_results.extend(page_results)
-            
+            pages.append(page_results)
+            fetched += len(page_results)
+
             # If we have enough results or this page returned no results, stop fetching
-            if len(all_results) >= limit or len(page_results) == 0:
+            if fetched >= limit or len(page_results) == 0:
                 break
-        
-        # Sort all results by seeders (descending) and limit to requested amount
-        all_results.sort(key=lambda x: x.get("seeders", 0), reverse=True)
-        if limit and len(all_results) > limit:
-            all_results = all_results[:limit]
-        
+
+        # Pages are sorted by seeders (descending), merge them up to the requested amount
+        all_results = top_k_merge(pages, limit)
+
         results = {
             "data": all_results,
             "time": time.time() - start_time,
             "total": len(all_results)
         }
-        
+
         return results